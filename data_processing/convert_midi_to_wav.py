@@ -4,23 +4,63 @@ Convert MIDI files to WAV audio files.
 
 This script converts a list of MIDI files to WAV format and saves them
 to a specified output directory.
+
+When pyfluidsynth and mido are installed, each worker process loads the
+SoundFont once and renders all of its files with the same synthesizer;
+otherwise the FluidSynth executable is launched per file.
 """
 
 import sys
 import os
 import subprocess
+import functools
+import multiprocessing
+import wave
 from pathlib import Path
+from midi_synth import (
+    FLUIDSYNTH_BINDINGS_AVAILABLE, SAMPLE_RATE, get_worker_synth, has_midi_header,
+    init_worker, load_midi, remove_partial_output, render_midi, warm_page_cache
+)
+
+
+def synthesize_midi_to_wav(midi_file, wav_file, synth):
+    """
+    Render a MIDI file to a 16-bit stereo WAV with an already-loaded synthesizer.
+    
+    If rendering fails partway, the truncated WAV is deleted before the
+    error is raised.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
+        wav_file (str): Path to output WAV file
+        synth: fluidsynth.Synth with the SoundFont loaded
+    """
+    mid = load_midi(midi_file)
+    
+    try:
+        with wave.open(wav_file, 'wb') as out:
+            out.setnchannels(2)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            
+            for pcm in render_midi(mid, synth):
+                out.writeframesraw(pcm)
+    except Exception:
+        remove_partial_output(wav_file)
+        raise
 
 
-def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe):
+def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe, synth=None):
     """
-    Convert a MIDI file to WAV format using FluidSynth command-line.
+    Convert a MIDI file to WAV format using FluidSynth.
     
     Args:
         midi_file (str): Path to the MIDI file to convert
         output_dir (str): Directory to save the WAV file
         soundfont (str): Path to a SoundFont file (.sf2)
         fluidsynth_exe (str): Path to FluidSynth executable
+        synth: Optional fluidsynth.Synth with the SoundFont already loaded.
+            If None, the FluidSynth command-line is used instead.
     """
     # Check if file exists
     if not os.path.exists(midi_file):
@@ -32,6 +72,11 @@ def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe):
         print(f"Warning: '{midi_file}' may not be a MIDI file. Skipping...")
         return False
     
+    # Check the header before launching FluidSynth
+    if not has_midi_header(midi_file):
+        print(f"Error: '{midi_file}' is not a valid MIDI file. Skipping...")
+        return False
+    
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
@@ -44,22 +89,29 @@ def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe):
         print(f"Converting: {midi_file}")
         print(f"  -> {output_path}")
         
-        # Build FluidSynth command
-        # Correct order for FluidSynth 2.5.1: fluidsynth -F output.wav soundfont.sf2 input.mid
-        cmd = [
-            fluidsynth_exe,
-            '-F', output_path,        # Output WAV file (must come before soundfont)
-            soundfont,                # SoundFont file
-            midi_file                 # Input MIDI file
-        ]
-        
-        # Run FluidSynth
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        if synth is not None:
+            synthesize_midi_to_wav(midi_file, output_path, synth)
+            stderr = None
+        else:
+            # Build FluidSynth command
+            # Correct order for FluidSynth 2.5.1: fluidsynth -F output.wav soundfont.sf2 input.mid
+            cmd = [
+                fluidsynth_exe,
+                '-F', output_path,        # Output WAV file (must come before soundfont)
+                soundfont,                # SoundFont file
+                midi_file                 # Input MIDI file
+            ]
+            
+            # Run FluidSynth; its banner/progress on stdout is never read,
+            # so only stderr is kept for error reporting
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=False
+            )
+            stderr = result.stderr
         
         # Check if output file was created
         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
@@ -67,8 +119,8 @@ def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe):
             return True
         else:
             print(f"  ✗ Failed to create output file")
-            if result.stderr:
-                print(f"  Error: {result.stderr}\n")
+            if stderr:
+                print(f"  Error: {stderr}\n")
             return False
         
     except Exception as e:
@@ -76,6 +128,19 @@ def convert_midi_to_wav(midi_file, output_dir, soundfont, fluidsynth_exe):
         return False
 
 
+def _worker(midi_file, output_dir, soundfont, fluidsynth_exe):
+    """
+    Pool worker: convert one MIDI file and report which file it was.
+    
+    Returns:
+        tuple: (midi_file: str, success: bool)
+    """
+    success = convert_midi_to_wav(
+        midi_file, output_dir, soundfont, fluidsynth_exe, synth=get_worker_synth()
+    )
+    return (midi_file, success)
+
+
 def main():
     """Main entry point."""
     # Define output directory for WAV files
@@ -98,12 +163,17 @@ def main():
         # Add more MIDI files here as needed
     ]
     
+    backend = "pyfluidsynth" if FLUIDSYNTH_BINDINGS_AVAILABLE else "FluidSynth CLI"
+    
     print("="*60)
-    print("MIDI to WAV Converter (FluidSynth CLI)")
+    print(f"MIDI to WAV Converter ({backend})")
     print("="*60)
     print(f"Output directory: {output_directory}")
     print(f"Files to convert: {len(midi_files)}")
-    print(f"FluidSynth: {fluidsynth_executable}")
+    if FLUIDSYNTH_BINDINGS_AVAILABLE:
+        print("FluidSynth: pyfluidsynth (one resident synth per worker)")
+    else:
+        print(f"FluidSynth: {fluidsynth_executable}")
     print(f"SoundFont: {soundfont_path}")
     print("="*60)
     print()
@@ -112,12 +182,28 @@ def main():
     success_count = 0
     fail_count = 0
     
-    for i, midi_file in enumerate(midi_files, 1):
-        print(f"[{i}/{len(midi_files)}]")
-        if convert_midi_to_wav(midi_file, output_directory, soundfont_path, fluidsynth_executable):
-            success_count += 1
-        else:
-            fail_count += 1
+    worker = functools.partial(
+        _worker,
+        output_dir=output_directory,
+        soundfont=soundfont_path,
+        fluidsynth_exe=fluidsynth_executable
+    )
+    
+    if FLUIDSYNTH_BINDINGS_AVAILABLE and os.path.exists(soundfont_path):
+        warm_page_cache(soundfont_path)
+    
+    with multiprocessing.Pool(
+        processes=os.cpu_count(),
+        initializer=init_worker,
+        initargs=(soundfont_path,)
+    ) as pool:
+        results = pool.imap_unordered(worker, midi_files, chunksize=1)
+        for i, (midi_file, success) in enumerate(results, 1):
+            print(f"[{i}/{len(midi_files)}] {os.path.basename(midi_file)}")
+            if success:
+                success_count += 1
+            else:
+                fail_count += 1
     
     # Print summary
     print("="*60)
@@ -4,21 +4,34 @@ Convert all MIDI files in xMidiDataset to MP3 format.
 
 This script:
 1. Scans xMidiDataset/ for all .mid files
-2. Converts MIDI to WAV using FluidSynth
-3. Converts WAV to MP3 using FFmpeg
+2. Renders MIDI audio with FluidSynth, piping it straight into FFmpeg
+3. Encodes the stream to MP3 with FFmpeg (no intermediate WAV on disk)
 4. Stores MP3 files in mp3_dataset/
-5. Cleans up intermediate WAV files
+
+When pyfluidsynth and mido are installed, each worker process keeps one
+synthesizer with the SoundFont loaded and reuses it for every file it
+converts. Otherwise the FluidSynth executable is launched per file, with
+an asyncio event loop keeping several conversions running at once.
 
 Dependencies:
     - FluidSynth (installed locally)
     - FFmpeg (must be in PATH or specify full path)
+    - pyfluidsynth, mido (optional, for the resident synthesizer)
 """
 
 import os
 import sys
+import queue
+import asyncio
+import threading
 import subprocess
-import tempfile
+import multiprocessing
+from collections import Counter
 from pathlib import Path
+from midi_synth import (
+    FLUIDSYNTH_BINDINGS_AVAILABLE, SAMPLE_RATE, get_worker_synth, has_midi_header,
+    init_worker, load_midi, remove_partial_output, render_midi, warm_page_cache
+)
 
 
 # Configuration
@@ -31,54 +44,170 @@ OUTPUT_DIR = "mp3_dataset"
 FFMPEG_EXE = "ffmpeg"  # Assumes ffmpeg is in PATH
 MP3_QUALITY = "2"  # VBR quality (0=best, 9=worst), 2 is ~190kbps
 
+# Pipe buffer for the FluidSynth -> FFmpeg audio stream
+PIPE_BUFFER_SIZE = 1 << 20  # 1 MiB, avoids small reads on the audio pipe
+
+# FluidSynth | FFmpeg pipelines run at once when using the executable
+MAX_CONCURRENT_CONVERSIONS = os.cpu_count() or 4
 
-def convert_midi_to_wav(midi_file, wav_file, soundfont, fluidsynth_exe):
+
+def _ffmpeg_command(mp3_file, ffmpeg_exe=FFMPEG_EXE, quality=MP3_QUALITY):
     """
-    Convert a MIDI file to WAV format using FluidSynth.
+    Build the FFmpeg command that encodes raw PCM from stdin to MP3.
+    
+    Args:
+        mp3_file (str): Path to output MP3 file
+        ffmpeg_exe (str): Path to FFmpeg executable
+        quality (str): VBR quality setting (0-9, lower is better)
+        
+    Returns:
+        list: Command line arguments
+    """
+    return [
+        ffmpeg_exe,
+        '-y',  # Overwrite output file if exists
+        '-nostats',
+        '-loglevel', 'error',  # Only errors on stderr, so it never fills up
+        '-f', 's16le',
+        '-ar', str(SAMPLE_RATE),
+        '-ac', '2',
+        '-i', 'pipe:0',
+        '-codec:a', 'libmp3lame',
+        '-qscale:a', quality,
+        mp3_file
+    ]
+
+
+async def render_midi_to_mp3(midi_file, mp3_file, soundfont, fluidsynth_exe,
+                             ffmpeg_exe=FFMPEG_EXE, quality=MP3_QUALITY):
+    """
+    Render a MIDI file to MP3 by piping FluidSynth output into FFmpeg.
+    
+    FluidSynth writes raw 16-bit stereo PCM to stdout, which FFmpeg reads
+    from stdin and encodes, so no intermediate WAV file touches the disk.
+    Both processes are awaited asynchronously so many conversions can be
+    in flight from a single Python process.
     
     Args:
         midi_file (str): Path to the MIDI file
-        wav_file (str): Path to output WAV file
+        mp3_file (str): Path to output MP3 file
         soundfont (str): Path to SoundFont file (.sf2)
         fluidsynth_exe (str): Path to FluidSynth executable
+        ffmpeg_exe (str): Path to FFmpeg executable
+        quality (str): VBR quality setting (0-9, lower is better)
         
     Returns:
         bool: True if conversion succeeded, False otherwise
     """
+    # Raw PCM rather than WAV: a WAV header cannot be finalized on a pipe
+    fluid_cmd = [
+        fluidsynth_exe,
+        '-q',  # Keep the banner out of the audio stream
+        '-F', '-',  # Fast-render to stdout
+        '-T', 'raw',
+        '-O', 's16',
+        '-E', 'little',
+        '-r', str(SAMPLE_RATE),
+        soundfont,
+        midi_file
+    ]
+    ffmpeg_cmd = _ffmpeg_command(mp3_file, ffmpeg_exe, quality)
+    
+    # OS-level pipe so the audio flows FluidSynth -> FFmpeg without
+    # passing through Python
+    read_fd, write_fd = os.pipe()
     try:
-        cmd = [
-            fluidsynth_exe,
-            '-F', wav_file,
-            soundfont,
-            midi_file
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        try:
+            fluid = await asyncio.create_subprocess_exec(
+                *fluid_cmd,
+                stdout=write_fd,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception as e:
+            print(f"    FluidSynth exception: {e}")
+            return False
         
-        if os.path.exists(wav_file) and os.path.getsize(wav_file) > 0:
-            return True
-        else:
-            if result.stderr:
-                print(f"    FluidSynth error: {result.stderr[:200]}")
+        try:
+            ffmpeg = await asyncio.create_subprocess_exec(
+                *ffmpeg_cmd,
+                stdin=read_fd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception as e:
+            fluid.kill()
+            await fluid.communicate()
+            if isinstance(e, FileNotFoundError):
+                print("    FFmpeg not found. Please install FFmpeg and add it to PATH.")
+            else:
+                print(f"    FFmpeg exception: {e}")
             return False
-            
-    except Exception as e:
-        print(f"    FluidSynth exception: {e}")
-        return False
+    finally:
+        # The children hold their own copies; closing ours lets FFmpeg see
+        # EOF and FluidSynth get SIGPIPE if FFmpeg exits early
+        os.close(read_fd)
+        os.close(write_fd)
+    
+    (_, ffmpeg_err), (_, fluid_err) = await asyncio.gather(
+        ffmpeg.communicate(),
+        fluid.communicate()
+    )
+    
+    if fluid.returncode != 0:
+        if fluid_err:
+            print(f"    FluidSynth error: {fluid_err.decode(errors='replace')[:200]}")
+        else:
+            print(f"    FluidSynth exited with code {fluid.returncode}")
+    elif ffmpeg.returncode != 0:
+        print(f"    FFmpeg error: {ffmpeg_err.decode(errors='replace')[:200]}")
+    elif os.path.exists(mp3_file) and os.path.getsize(mp3_file) > 0:
+        return True
+    
+    remove_partial_output(mp3_file)
+    return False
 
 
-def convert_wav_to_mp3(wav_file, mp3_file, ffmpeg_exe=FFMPEG_EXE, quality=MP3_QUALITY):
+def _pipe_writer(chunks, stream, errors):
     """
-    Convert a WAV file to MP3 format using FFmpeg.
+    Copy queued PCM chunks into FFmpeg's stdin until a None sentinel arrives.
+    
+    Runs on its own thread so the synthesizer can render the next chunk
+    while this one is blocked waiting for FFmpeg to drain the pipe. The
+    stream is left open; communicate() flushes and closes it afterwards.
     
     Args:
-        wav_file (str): Path to the WAV file
+        chunks (queue.Queue): Rendered PCM bytes, terminated by None
+        stream: FFmpeg stdin
+        errors (list): Receives the exception if writing fails
+    """
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        if errors:
+            # Keep draining so the producer never blocks on a dead pipe
+            continue
+        try:
+            stream.write(chunk)
+        except Exception as e:
+            errors.append(e)
+
+
+def synthesize_midi_to_mp3(midi_file, mp3_file, synth,
+                           ffmpeg_exe=FFMPEG_EXE, quality=MP3_QUALITY):
+    """
+    Render a MIDI file to MP3 with an already-loaded synthesizer.
+    
+    MIDI events are played into the synthesizer in time order and the
+    rendered PCM is streamed into FFmpeg's stdin, so the SoundFont load is
+    paid once per synthesizer rather than once per file. A writer thread
+    feeds FFmpeg through a small bounded queue, so synthesis of the next
+    chunk overlaps with encoding of the previous one.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
         mp3_file (str): Path to output MP3 file
+        synth: fluidsynth.Synth with the SoundFont loaded
         ffmpeg_exe (str): Path to FFmpeg executable
         quality (str): VBR quality setting (0-9, lower is better)
         
@@ -86,40 +215,92 @@ def convert_wav_to_mp3(wav_file, mp3_file, ffmpeg_exe=FFMPEG_EXE, quality=MP3_QU
         bool: True if conversion succeeded, False otherwise
     """
     try:
-        cmd = [
-            ffmpeg_exe,
-            '-y',  # Overwrite output file if exists
-            '-i', wav_file,
-            '-codec:a', 'libmp3lame',
-            '-qscale:a', quality,
-            mp3_file
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False
+        mid = load_midi(midi_file)
+    except Exception as e:
+        print(f"    MIDI parse error: {e}")
+        return False
+    
+    try:
+        ffmpeg = subprocess.Popen(
+            _ffmpeg_command(mp3_file, ffmpeg_exe, quality),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            bufsize=PIPE_BUFFER_SIZE
         )
-        
-        if os.path.exists(mp3_file) and os.path.getsize(mp3_file) > 0:
-            return True
-        else:
-            if result.stderr:
-                # FFmpeg outputs to stderr even on success, check for actual errors
-                if "Error" in result.stderr or "error" in result.stderr:
-                    print(f"    FFmpeg error: {result.stderr[:200]}")
-            return False
-            
     except FileNotFoundError:
         print("    FFmpeg not found. Please install FFmpeg and add it to PATH.")
         return False
     except Exception as e:
         print(f"    FFmpeg exception: {e}")
         return False
+    
+    chunks = queue.Queue(maxsize=2)
+    write_errors = []
+    writer = threading.Thread(
+        target=_pipe_writer,
+        args=(chunks, ffmpeg.stdin, write_errors),
+        daemon=True
+    )
+    writer.start()
+    
+    try:
+        pending = bytearray()
+        for pcm in render_midi(mid, synth):
+            if write_errors:
+                raise write_errors[0]
+            pending += pcm
+            # Hand off pipe-sized chunks rather than every small block
+            if len(pending) >= PIPE_BUFFER_SIZE:
+                chunks.put(bytes(pending))
+                pending.clear()
+        if pending:
+            chunks.put(bytes(pending))
+    except Exception as e:
+        print(f"    Synthesis exception: {e}")
+        ffmpeg.kill()
+        chunks.put(None)
+        writer.join()
+        ffmpeg.communicate()
+        remove_partial_output(mp3_file)
+        return False
+    
+    chunks.put(None)
+    writer.join()
+    _, ffmpeg_err = ffmpeg.communicate()
+    
+    if write_errors:
+        print(f"    Pipe write error: {write_errors[0]}")
+    elif ffmpeg.returncode != 0:
+        print(f"    FFmpeg error: {ffmpeg_err.decode(errors='replace')[:200]}")
+    elif os.path.exists(mp3_file) and os.path.getsize(mp3_file) > 0:
+        return True
+    
+    remove_partial_output(mp3_file)
+    return False
 
 
-def convert_midi_to_mp3(midi_file, output_dir, soundfont, fluidsynth_exe, skip_existing=True):
+def _check_input(midi_file, mp3_path, skip_existing):
+    """
+    Decide whether a file can be resolved without rendering.
+    
+    Returns:
+        tuple: (success, skipped) if no rendering is needed, otherwise None
+    """
+    # Skip if already exists
+    if skip_existing and os.path.exists(mp3_path):
+        return (True, True)  # Success, but skipped
+    
+    # Reject broken files before starting any synthesis
+    if not has_midi_header(midi_file):
+        print(f"    Not a valid MIDI file: {midi_file}")
+        return (False, False)
+    
+    return None
+
+
+def convert_midi_to_mp3(midi_file, output_dir, soundfont, fluidsynth_exe,
+                        skip_existing=True, synth=None):
     """
     Convert a MIDI file to MP3 format.
     
@@ -129,46 +310,107 @@ def convert_midi_to_mp3(midi_file, output_dir, soundfont, fluidsynth_exe, skip_e
         soundfont (str): Path to SoundFont file (.sf2)
         fluidsynth_exe (str): Path to FluidSynth executable
         skip_existing (bool): Skip if MP3 already exists
+        synth: Optional fluidsynth.Synth with the SoundFont already loaded.
+            If None, the FluidSynth executable is used instead.
         
     Returns:
         tuple: (success: bool, skipped: bool)
     """
-    midi_path = Path(midi_file)
-    mp3_filename = midi_path.stem + '.mp3'
-    mp3_path = os.path.join(output_dir, mp3_filename)
+    mp3_path = os.path.join(output_dir, Path(midi_file).stem + '.mp3')
     
-    # Skip if already exists
-    if skip_existing and os.path.exists(mp3_path):
-        return (True, True)  # Success, but skipped
+    resolved = _check_input(midi_file, mp3_path, skip_existing)
+    if resolved is not None:
+        return resolved
     
-    # Create temporary WAV file
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_wav:
-        wav_path = tmp_wav.name
+    if synth is not None:
+        success = synthesize_midi_to_mp3(midi_file, mp3_path, synth)
+    else:
+        success = asyncio.run(
+            render_midi_to_mp3(midi_file, mp3_path, soundfont, fluidsynth_exe)
+        )
     
-    try:
-        # Step 1: MIDI -> WAV
-        if not convert_midi_to_wav(midi_file, wav_path, soundfont, fluidsynth_exe):
-            return (False, False)
-        
-        # Step 2: WAV -> MP3
-        if not convert_wav_to_mp3(wav_path, mp3_path):
-            return (False, False)
+    return (success, False)
+
+
+async def convert_midi_to_mp3_async(midi_file, output_dir, soundfont, fluidsynth_exe,
+                                    skip_existing=True):
+    """
+    Convert a MIDI file to MP3 format with the FluidSynth executable,
+    without blocking the event loop.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
+        output_dir (str): Directory to save the MP3 file
+        soundfont (str): Path to SoundFont file (.sf2)
+        fluidsynth_exe (str): Path to FluidSynth executable
+        skip_existing (bool): Skip if MP3 already exists
         
-        return (True, False)
+    Returns:
+        tuple: (success: bool, skipped: bool)
+    """
+    mp3_path = os.path.join(output_dir, Path(midi_file).stem + '.mp3')
+    
+    resolved = _check_input(midi_file, mp3_path, skip_existing)
+    if resolved is not None:
+        return resolved
+    
+    success = await render_midi_to_mp3(midi_file, mp3_path, soundfont, fluidsynth_exe)
+    return (success, False)
+
+
+def _worker(midi_file):
+    """
+    Pool worker: convert one MIDI file using the module configuration.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
         
-    finally:
-        # Clean up temporary WAV file
-        if os.path.exists(wav_path):
-            try:
-                os.unlink(wav_path)
-            except Exception:
-                pass
+    Returns:
+        tuple: (midi_file: str, success: bool, skipped: bool)
+    """
+    success, skipped = convert_midi_to_mp3(
+        midi_file,
+        OUTPUT_DIR,
+        SOUNDFONT_PATH,
+        FLUIDSYNTH_EXE,
+        skip_existing=False,  # main() already filtered out existing MP3s
+        synth=get_worker_synth()
+    )
+    return (midi_file, success, skipped)
+
+
+async def _convert_all_async(midi_files, on_result):
+    """
+    Convert MIDI files with the FluidSynth executable, keeping up to
+    MAX_CONCURRENT_CONVERSIONS FluidSynth | FFmpeg pipelines in flight.
+    
+    Args:
+        midi_files (list): Paths to the MIDI files
+        on_result (callable): Called with (midi_file, success, skipped) for
+            each file, in completion order
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONVERSIONS)
+    
+    async def run_one(midi_file):
+        async with semaphore:
+            success, skipped = await convert_midi_to_mp3_async(
+                midi_file,
+                OUTPUT_DIR,
+                SOUNDFONT_PATH,
+                FLUIDSYNTH_EXE,
+                skip_existing=False  # main() already filtered out existing MP3s
+            )
+        return (midi_file, success, skipped)
+    
+    pending = [run_one(midi_file) for midi_file in midi_files]
+    for finished in asyncio.as_completed(pending):
+        on_result(await finished)
 
 
 def main():
     """Main entry point."""
     # Validate paths
-    if not os.path.exists(FLUIDSYNTH_EXE):
+    if not FLUIDSYNTH_BINDINGS_AVAILABLE and not os.path.exists(FLUIDSYNTH_EXE):
         print(f"Error: FluidSynth not found at: {FLUIDSYNTH_EXE}")
         sys.exit(1)
     
@@ -183,13 +425,13 @@ def main():
     # Create output directory
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Find all MIDI files
-    midi_files = []
-    for filename in os.listdir(INPUT_DIR):
-        if filename.lower().endswith(('.mid', '.midi')):
-            midi_files.append(os.path.join(INPUT_DIR, filename))
-    
-    midi_files.sort()
+    # Find all MIDI files (DirEntry carries the name, path and file type,
+    # so no extra join or stat per entry)
+    with os.scandir(INPUT_DIR) as entries:
+        midi_files = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(('.mid', '.midi'))
+        )
     
     if not midi_files:
         print("No MIDI files found in xMidiDataset/")
@@ -202,48 +444,73 @@ def main():
     print(f"Input directory:  {INPUT_DIR}")
     print(f"Output directory: {OUTPUT_DIR}")
     print(f"Files to convert: {len(midi_files)}")
-    print(f"FluidSynth:       {FLUIDSYNTH_EXE}")
+    if FLUIDSYNTH_BINDINGS_AVAILABLE:
+        print("FluidSynth:       pyfluidsynth (one resident synth per worker)")
+    else:
+        print(f"FluidSynth:       {FLUIDSYNTH_EXE}")
     print(f"SoundFont:        {SOUNDFONT_PATH}")
     print("=" * 70)
     print()
     
     # Convert each file
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
+    counts = Counter()
     
-    for i, midi_file in enumerate(midi_files, 1):
+    def report(result):
+        midi_file, success, skipped = result
         filename = os.path.basename(midi_file)
         
-        print(f"[{i:3d}/{len(midi_files)}] {filename}")
-        
-        success, skipped = convert_midi_to_mp3(
-            midi_file,
-            OUTPUT_DIR,
-            SOUNDFONT_PATH,
-            FLUIDSYNTH_EXE,
-            skip_existing=True
-        )
+        print(f"[{sum(counts.values()) + 1:3d}/{len(midi_files)}] {filename}")
         
         if success:
             if skipped:
                 print(f"           -> Skipped (already exists)")
-                skip_count += 1
+                counts['skipped'] += 1
             else:
                 print(f"           -> OK")
-                success_count += 1
+                counts['converted'] += 1
         else:
             print(f"           -> FAILED")
-            fail_count += 1
+            counts['failed'] += 1
+    
+    # Resolve already-converted files with one directory scan instead of a
+    # stat per file, so workers only ever see files that need rendering
+    with os.scandir(OUTPUT_DIR) as entries:
+        existing = {entry.name for entry in entries if entry.name.endswith('.mp3')}
+    
+    to_convert = []
+    for midi_file in midi_files:
+        if Path(midi_file).stem + '.mp3' in existing:
+            report((midi_file, True, True))
+        else:
+            to_convert.append(midi_file)
+    
+    # Files are independent, so convert them concurrently and report
+    # each one as soon as it finishes.
+    if to_convert:
+        warm_page_cache(SOUNDFONT_PATH)
+        
+        if FLUIDSYNTH_BINDINGS_AVAILABLE:
+            # Synthesis runs in-process, so spread it over worker processes
+            with multiprocessing.Pool(
+                processes=os.cpu_count(),
+                initializer=init_worker,
+                initargs=(SOUNDFONT_PATH,)
+            ) as pool:
+                for result in pool.imap_unordered(_worker, to_convert, chunksize=1):
+                    report(result)
+        else:
+            # All the work happens in child processes, so one event loop can
+            # drive many pipelines at once
+            asyncio.run(_convert_all_async(to_convert, report))
     
     # Print summary
     print()
     print("=" * 70)
     print("Conversion Summary")
     print("=" * 70)
-    print(f"  Converted: {success_count}")
-    print(f"  Skipped:   {skip_count}")
-    print(f"  Failed:    {fail_count}")
+    print(f"  Converted: {counts['converted']}")
+    print(f"  Skipped:   {counts['skipped']}")
+    print(f"  Failed:    {counts['failed']}")
     print(f"  Total:     {len(midi_files)}")
     print("=" * 70)
     print(f"\nMP3 files saved to: {os.path.abspath(OUTPUT_DIR)}")
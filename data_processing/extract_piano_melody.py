@@ -1,9 +1,21 @@
 # Extract piano melodies from MIDI files
 import note_seq
+import numpy as np
 import csv
 import os
+import functools
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from magenta.pipelines import melody_pipelines
 
+logger = logging.getLogger(__name__)
+
+# Scratch sequence reused by every extract_piano_melody call in this process;
+# Clear() resets it in place instead of allocating a fresh protobuf each time
+_TEMP_SEQ = note_seq.NoteSequence()
+
 
 def format_duration(seconds):
     """
@@ -23,6 +35,21 @@ def format_duration(seconds):
     return f"{minutes}:{secs:02d}"
 
 
+@functools.lru_cache(maxsize=None)
+def load_csv(path):
+    """
+    Read a CSV file into a list of row dictionaries, cached by path.
+    
+    Args:
+        path (str): Path to the CSV file
+        
+    Returns:
+        list: Rows as dictionaries (shared between callers, don't modify)
+    """
+    with open(path, 'r') as f:
+        return list(csv.DictReader(f))
+
+
 def get_predominant_time_signature(sequence):
     """
     Determine which time signature is active for the longest duration.
@@ -34,44 +61,32 @@ def get_predominant_time_signature(sequence):
         tuple: (numerator, denominator) of the predominant time signature
     """
     if not sequence.time_signatures:
-        print("No time signatures found, using default: 4/4")
+        logger.info("No time signatures found, using default: 4/4")
         return (4, 4)  # Default to 4/4
     
     if len(sequence.time_signatures) == 1:
-        print("Only one time signature found, using it")
+        logger.info("Only one time signature found, using it")
         ts = sequence.time_signatures[0]
         return (ts.numerator, ts.denominator)
     
-    # Calculate duration for each time signature
-    time_sig_durations = []
-    total_time = sequence.total_time
-    
-    for i, ts in enumerate(sequence.time_signatures):
-        start_time = ts.time
-        # End time is either the next time signature or the end of the sequence
-        if i + 1 < len(sequence.time_signatures):
-            end_time = sequence.time_signatures[i + 1].time
-        else:
-            end_time = total_time
-        
-        duration = end_time - start_time
-        time_sig_durations.append({
-            'numerator': ts.numerator,
-            'denominator': ts.denominator,
-            'duration': duration,
-            'start_time': start_time
-        })
+    # Each time signature lasts until the next one (or the end of the sequence)
+    time_signatures = sequence.time_signatures
+    start_times = np.array([ts.time for ts in time_signatures], dtype=np.float64)
+    end_times = np.r_[start_times[1:], sequence.total_time]
+    durations = end_times - start_times
     
     # Find the time signature with the longest duration
-    predominant = max(time_sig_durations, key=lambda x: x['duration'])
+    predominant_idx = int(np.argmax(durations))
     
-    print(f"  Time signatures found:")
-    for ts in time_sig_durations:
-        marker = " <- PREDOMINANT" if ts == predominant else ""
-        print(f"    {ts['numerator']}/{ts['denominator']} " +
-              f"from {ts['start_time']:.2f}s, duration: {ts['duration']:.2f}s{marker}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("  Time signatures found:")
+        for i, ts in enumerate(time_signatures):
+            marker = " <- PREDOMINANT" if i == predominant_idx else ""
+            logger.debug("    %d/%d from %.2fs, duration: %.2fs%s",
+                         ts.numerator, ts.denominator, start_times[i], durations[i], marker)
     
-    return (predominant['numerator'], predominant['denominator'])
+    predominant = time_signatures[predominant_idx]
+    return (predominant.numerator, predominant.denominator)
 
 
 def get_predominant_tempo(sequence):
@@ -85,42 +100,30 @@ def get_predominant_tempo(sequence):
         float: QPM (quarters per minute) of the predominant tempo
     """
     if not sequence.tempos:
-        print("No tempos found, using default")
+        logger.info("No tempos found, using default")
         return note_seq.DEFAULT_QUARTERS_PER_MINUTE
     
     if len(sequence.tempos) == 1:
-        print("Only one tempo found, using it")
+        logger.info("Only one tempo found, using it")
         return sequence.tempos[0].qpm
     
-    # Calculate duration for each tempo
-    tempo_durations = []
-    total_time = sequence.total_time
-    
-    for i, tempo in enumerate(sequence.tempos):
-        start_time = tempo.time
-        # End time is either the next tempo or the end of the sequence
-        if i + 1 < len(sequence.tempos):
-            end_time = sequence.tempos[i + 1].time
-        else:
-            end_time = total_time
-        
-        duration = end_time - start_time
-        tempo_durations.append({
-            'qpm': tempo.qpm,
-            'duration': duration,
-            'start_time': start_time
-        })
+    # Each tempo lasts until the next one (or the end of the sequence)
+    tempos = sequence.tempos
+    start_times = np.array([tempo.time for tempo in tempos], dtype=np.float64)
+    end_times = np.r_[start_times[1:], sequence.total_time]
+    durations = end_times - start_times
     
     # Find the tempo with the longest duration
-    predominant = max(tempo_durations, key=lambda x: x['duration'])
+    predominant_idx = int(np.argmax(durations))
     
-    print(f"  Tempos found:")
-    for tempo in tempo_durations:
-        marker = " <- PREDOMINANT" if tempo == predominant else ""
-        print(f"    {tempo['qpm']:.2f} BPM " +
-              f"from {tempo['start_time']:.2f}s, duration: {tempo['duration']:.2f}s{marker}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("  Tempos found:")
+        for i, tempo in enumerate(tempos):
+            marker = " <- PREDOMINANT" if i == predominant_idx else ""
+            logger.debug("    %.2f BPM from %.2fs, duration: %.2fs%s",
+                         tempo.qpm, start_times[i], durations[i], marker)
     
-    return predominant['qpm']
+    return tempos[predominant_idx].qpm
 
 
 def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
@@ -135,22 +138,22 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
     try:
         sequence = note_seq.midi_file_to_note_sequence(test_file)
     except Exception as e:
-        print(f"Error loading MIDI file: {e}")
+        logger.error("Error loading MIDI file %s: %s", test_file, e)
         return False
     
     # Extract the original tempo (QPM = Quarters Per Minute)
     if sequence.tempos:
         original_qpm = sequence.tempos[0].qpm
-        print(f"Original tempo: {original_qpm} BPM")
+        logger.info("Original tempo: %s BPM", original_qpm)
     else:
         original_qpm = note_seq.DEFAULT_QUARTERS_PER_MINUTE
-        print(f"No tempo found, using default: {original_qpm} BPM")
+        logger.info("No tempo found, using default: %s BPM", original_qpm)
 
     # Try to quantize the sequence
     try:
         quantized = note_seq.quantize_note_sequence(sequence, steps_per_quarter=4)
     except note_seq.MultipleTimeSignatureError as e:
-        print(f"Warning: Multiple time signatures detected. Finding predominant one...")
+        logger.warning("Multiple time signatures detected. Finding predominant one...")
         
         # Get the predominant time signature
         numerator, denominator = get_predominant_time_signature(sequence)
@@ -163,13 +166,13 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
             time=0
         )
         
-        print(f"  Using {numerator}/{denominator} time signature")
+        logger.info("  Using %d/%d time signature", numerator, denominator)
         
         try:
             quantized = note_seq.quantize_note_sequence(sequence, steps_per_quarter=4)
-            print("Successfully quantized after fixing time signatures")
+            logger.info("Successfully quantized after fixing time signatures")
         except note_seq.MultipleTempoError as e2:
-            print(f"Warning: Multiple tempos detected after fixing time signatures. Finding predominant one...")
+            logger.warning("Multiple tempos detected after fixing time signatures. Finding predominant one...")
             
             # Get the predominant tempo
             predominant_qpm = get_predominant_tempo(sequence)
@@ -180,19 +183,19 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
             
             # Update the original_qpm to use the predominant tempo
             original_qpm = predominant_qpm
-            print(f"  Using {predominant_qpm:.2f} BPM")
+            logger.info("  Using %.2f BPM", predominant_qpm)
             
             try:
                 quantized = note_seq.quantize_note_sequence(sequence, steps_per_quarter=4)
-                print("Successfully quantized after fixing tempos")
+                logger.info("Successfully quantized after fixing tempos")
             except Exception as e3:
-                print(f"Error: Could not quantize sequence even after fixing: {e3}")
+                logger.error("Could not quantize sequence even after fixing: %s", e3)
                 return False
         except Exception as e2:
-            print(f"Error: Could not quantize sequence even after fixing: {e2}")
+            logger.error("Could not quantize sequence even after fixing: %s", e2)
             return False
     except note_seq.MultipleTempoError as e:
-        print(f"Warning: Multiple tempos detected. Finding predominant one...")
+        logger.warning("Multiple tempos detected. Finding predominant one...")
         
         # Get the predominant tempo
         predominant_qpm = get_predominant_tempo(sequence)
@@ -203,13 +206,13 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
         
         # Update the original_qpm to use the predominant tempo
         original_qpm = predominant_qpm
-        print(f"  Using {predominant_qpm:.2f} BPM")
+        logger.info("  Using %.2f BPM", predominant_qpm)
         
         try:
             quantized = note_seq.quantize_note_sequence(sequence, steps_per_quarter=4)
-            print("Successfully quantized after fixing tempos")
+            logger.info("Successfully quantized after fixing tempos")
         except note_seq.MultipleTimeSignatureError as e2:
-            print(f"Warning: Multiple time signatures detected after fixing tempos. Finding predominant one...")
+            logger.warning("Multiple time signatures detected after fixing tempos. Finding predominant one...")
             
             # Get the predominant time signature
             numerator, denominator = get_predominant_time_signature(sequence)
@@ -222,19 +225,19 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
                 time=0
             )
             
-            print(f"  Using {numerator}/{denominator} time signature")
+            logger.info("  Using %d/%d time signature", numerator, denominator)
             
             try:
                 quantized = note_seq.quantize_note_sequence(sequence, steps_per_quarter=4)
-                print("Successfully quantized after fixing both tempos and time signatures")
+                logger.info("Successfully quantized after fixing both tempos and time signatures")
             except Exception as e3:
-                print(f"Error: Could not quantize sequence even after fixing: {e3}")
+                logger.error("Could not quantize sequence even after fixing: %s", e3)
                 return False
         except Exception as e2:
-            print(f"Error: Could not quantize sequence even after fixing: {e2}")
+            logger.error("Could not quantize sequence even after fixing: %s", e2)
             return False
     except Exception as e:
-        print(f"Error quantizing sequence: {e}")
+        logger.error("Error quantizing sequence: %s", e)
         return False
 
     # Get time signature
@@ -256,13 +259,16 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
     start_time = start_step * seconds_per_step
     end_time = end_step * seconds_per_step
     
-    print(f"Extracting bars {start_bar} to {start_bar + num_bars - 1} ({num_bars} bars total)")
-    print(f"  Time signature: {numerator}/{denominator}")
-    print(f"  Steps per bar: {steps_per_bar}")
-    print(f"  Time window: {format_duration(start_time)} to {format_duration(end_time)}")
+    logger.info("Extracting bars %d to %d (%d bars total)", start_bar, start_bar + num_bars - 1, num_bars)
+    logger.info("  Time signature: %d/%d", numerator, denominator)
+    logger.info("  Steps per bar: %d", steps_per_bar)
+    logger.info("  Time window: %s to %s", format_duration(start_time), format_duration(end_time))
     
-    # First, extract just the notes in our time window into a temporary sequence
-    temp_sequence = note_seq.NoteSequence()
+    # First, extract just the notes in our time window into a temporary sequence.
+    # It reuses the first-pass quantization (same tempo and time signature),
+    # so it is built already quantized rather than quantized a second time.
+    temp_sequence = _TEMP_SEQ
+    temp_sequence.Clear()
     temp_sequence.tempos.add().qpm = original_qpm
     temp_sequence.ticks_per_quarter = note_seq.STANDARD_PPQ
     temp_sequence.time_signatures.add(
@@ -270,38 +276,59 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
         denominator=denominator,
         time=0
     )
-    
-    notes_in_window = 0
-    for note in quantized.notes:
-        # Check if note overlaps with our window
-        if note.start_time < end_time and note.end_time > start_time:
-            new_note = temp_sequence.notes.add()
-            # Shift times so the extracted section starts at 0
-            new_note.start_time = max(0, note.start_time - start_time)
-            new_note.end_time = min(note.end_time - start_time, end_time - start_time)
-            new_note.pitch = note.pitch
-            new_note.velocity = note.velocity
-            new_note.instrument = note.instrument
-            new_note.program = note.program
-            notes_in_window += 1
+    temp_sequence.quantization_info.steps_per_quarter = steps_per_quarter
+    
+    # Find the notes that overlap our window in one vectorized pass
+    notes = quantized.notes
+    starts = np.fromiter((note.start_time for note in notes), dtype=np.float64, count=len(notes))
+    ends = np.fromiter((note.end_time for note in notes), dtype=np.float64, count=len(notes))
+    in_window = np.flatnonzero((starts < end_time) & (ends > start_time))
+    
+    # Shift times so the extracted section starts at 0
+    new_starts = np.maximum(0, starts[in_window] - start_time)
+    new_ends = np.minimum(ends[in_window] - start_time, end_time - start_time)
+    
+    # Shift quantized steps the same way
+    start_steps = np.fromiter((notes[i].quantized_start_step for i in in_window),
+                              dtype=np.int64, count=len(in_window))
+    end_steps = np.fromiter((notes[i].quantized_end_step for i in in_window),
+                            dtype=np.int64, count=len(in_window))
+    new_start_steps = np.maximum(0, start_steps - start_step)
+    new_end_steps = np.minimum(end_steps - start_step, end_step - start_step)
+    # Like the quantizer, never let a note collapse to zero steps
+    new_end_steps = np.maximum(new_end_steps, new_start_steps + 1)
+    
+    kept_notes = []
+    for idx, new_start, new_end, new_start_step, new_end_step in zip(
+            in_window.tolist(), new_starts.tolist(), new_ends.tolist(),
+            new_start_steps.tolist(), new_end_steps.tolist()):
+        # One C-level copy of pitch/velocity/instrument/program/etc., then
+        # only the shifted timing is set field by field
+        new_note = note_seq.NoteSequence.Note()
+        new_note.CopyFrom(notes[idx])
+        new_note.start_time = new_start
+        new_note.end_time = new_end
+        new_note.quantized_start_step = new_start_step
+        new_note.quantized_end_step = new_end_step
+        kept_notes.append(new_note)
+    temp_sequence.notes.extend(kept_notes)
+    notes_in_window = len(kept_notes)
     
     if notes_in_window == 0:
-        print(f"Warning: No notes found in bars {start_bar}-{start_bar + num_bars - 1}")
+        logger.warning("No notes found in bars %d-%d of %s", start_bar, start_bar + num_bars - 1, test_file)
         return False
     
-    print(f"Found {notes_in_window} notes in window")
+    logger.info("Found %d notes in window", notes_in_window)
     
     # Set the total time for the temporary sequence
     temp_sequence.total_time = end_time - start_time
-    
-    # Quantize the temp sequence
-    temp_quantized = note_seq.quantize_note_sequence(temp_sequence, steps_per_quarter=4)
+    temp_sequence.total_quantized_steps = max(end_step - start_step, int(new_end_steps.max()))
     
     # Extract monophonic melody using Magenta's melody extraction
     # This ensures MusicVAE will accept it as a single segment
-    print(f"Extracting monophonic melody...")
+    logger.info("Extracting monophonic melody...")
     melodies, stats = melody_pipelines.extract_melodies(
-        temp_quantized,
+        temp_sequence,
         min_bars=num_bars,
         gap_bars=num_bars,
         max_steps_truncate=None,
@@ -311,13 +338,14 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
     )
     
     if not melodies:
-        print(f"Warning: Could not extract monophonic melody from bars {start_bar}-{start_bar + num_bars - 1}")
-        print(f"  The section may be too sparse or polyphonic.")
+        logger.warning("Could not extract monophonic melody from bars %d-%d of %s",
+                       start_bar, start_bar + num_bars - 1, test_file)
+        logger.warning("  The section may be too sparse or polyphonic.")
         return False
     
     # Take the first/longest melody
     melody = max(melodies, key=lambda m: len(m))
-    print(f"Extracted melody with {len(melody)} steps")
+    logger.info("Extracted melody with %d steps", len(melody))
     
     # Convert melody back to sequence with original tempo
     output_sequence = melody.to_sequence(qpm=original_qpm)
@@ -326,25 +354,58 @@ def extract_piano_melody(test_file, output_file, start_bar=0, num_bars=2):
     # Calculate the exact duration for num_bars
     exact_duration = end_time - start_time
 
+    # Drop notes that start at or after the boundary. Build the keep-list
+    # first: removing from the repeated field while iterating skips notes.
+    survivors = [note for note in output_sequence.notes if note.start_time < exact_duration]
+    
     # Truncate notes that extend beyond the exact bar boundary
-    for note in output_sequence.notes:
+    for note in survivors:
         if note.end_time > exact_duration:
             note.end_time = exact_duration
-        # Remove notes that start at or after the boundary
-        if note.start_time >= exact_duration:
-            output_sequence.notes.remove(note)
+    
+    del output_sequence.notes[:]
+    output_sequence.notes.extend(survivors)
 
     # Ensure the output has the correct duration
     output_sequence.total_time = exact_duration
-    print(f"Output duration: {format_duration(output_sequence.total_time)}")
-    print(f"Output tempo: {output_sequence.tempos[0].qpm} BPM")
-    print(f"Output notes: {len(output_sequence.notes)}")
+    logger.info("Output duration: %s", format_duration(output_sequence.total_time))
+    logger.info("Output tempo: %s BPM", output_sequence.tempos[0].qpm)
+    logger.info("Output notes: %d", len(output_sequence.notes))
     
     note_seq.sequence_proto_to_midi_file(output_sequence, output_file)
-    print(f"Saved to {output_file}")
+    logger.info("Saved to %s", output_file)
     return True
 
+def _preload_magenta(log_queue):
+    """
+    Worker initializer: set up logging and warm up Magenta once per process.
+    
+    Log records are handed to a QueueListener in the parent, which writes them
+    one at a time, so output from different workers doesn't interleave. A
+    throwaway melody extraction on a one-note sequence then pays the lazy
+    note_seq/Magenta setup cost here instead of inside the first real task.
+    
+    Args:
+        log_queue: multiprocessing.Queue read by the parent's QueueListener
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    
+    warmup = note_seq.NoteSequence()
+    warmup.tempos.add(qpm=120)
+    warmup.notes.add(pitch=60, velocity=80, start_time=0.0, end_time=1.0)
+    warmup.total_time = 1.0
+    try:
+        quantized = note_seq.quantize_note_sequence(warmup, steps_per_quarter=4)
+        melody_pipelines.extract_melodies(quantized, min_bars=1, gap_bars=1.0)
+    except Exception as e:
+        logger.warning("Magenta warm-up failed: %s", e)
+
+
 if __name__ == "__main__":
+    # Do all CSV/config work up front, then fan the extractions out to a pool
+    tasks = []
     for measure in [16]:
         for story in ['carnival', 'lantern', 'starling_five', 'window_blue_curtain']:
             if "window_blue_curtain" not in story:
@@ -354,16 +415,11 @@ if __name__ == "__main__":
             os.makedirs(output_dir, exist_ok=True)
 
             # Read CSV file
-            cluster_data = []
-            with open(csv_path, 'r') as f:
-                    csv_reader = csv.DictReader(f)
-                    cluster_data = list(csv_reader)
+            cluster_data = load_csv(csv_path)
 
             base_path = "xMidiDataset"
-            success_count = 0
-            total_count = len(cluster_data)
 
-            for idx, item in enumerate(cluster_data):
+            for item in cluster_data:
                 if "2" not in item['Cluster']:
                     continue
                 cluster_id = item['Cluster'].replace('.0', '')  # Remove .0 from cluster number
@@ -373,13 +429,35 @@ if __name__ == "__main__":
                 # Get the starting bar from CSV (convert to 0-indexed integer)
                 start_bar = int(item['Window_Start'])
                 
-                print(f"\n{'='*60}")
-                print(f"Processing Cluster {cluster_id}: {item['Nearest_Piece_Name']}")
-                print(f"{'='*60}")
-                
-                if extract_piano_melody(midi_path, output_file, start_bar=start_bar, num_bars=measure):
-                    success_count += 1
+                print(f"Queued {story} cluster {cluster_id} ({measure} bars): {item['Nearest_Piece_Name']}")
+                tasks.append((midi_path, output_file, start_bar, measure))
+
+    print(f"\n{'='*60}")
+    print(f"Extracting {len(tasks)} melodies")
+    print(f"{'='*60}")
+
+    # Each extraction is independent; one task per worker call since each
+    # one takes a while
+    log_queue = multiprocessing.Queue()
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("[%(processName)s] %(message)s"))
+    log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+    log_listener.start()
+    
+    # Workers import note_seq/Magenta (and TensorFlow) once each and are
+    # reused across tasks, so that cost is paid per worker, not per file
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        initializer=_preload_magenta,
+        initargs=(log_queue,)
+    ) as executor:
+        results = list(executor.map(extract_piano_melody, *zip(*tasks))) if tasks else []
+    
+    # Flush any remaining worker output before the summary
+    log_listener.stop()
+
+    success_count = sum(1 for success in results if success)
 
-            print(f"\n{'='*60}")
-            print(f"Completed: {success_count} successful extractions")
-            print(f"{'='*60}")
\ No newline at end of file
+    print(f"\n{'='*60}")
+    print(f"Completed: {success_count}/{len(tasks)} successful extractions")
+    print(f"{'='*60}")
@@ -2,14 +2,28 @@
 """Script to concatenate multiple MIDI files into a single MIDI file."""
 
 import argparse
+import functools
 import os
-import pretty_midi
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+try:
+    from symusic import Score
+    SYMUSIC_AVAILABLE = True
+except ImportError:
+    SYMUSIC_AVAILABLE = False
+
+# Below this many input files, parsing serially is faster than starting a
+# process pool (each worker has to import pretty_midi first)
+PARALLEL_PARSE_MIN_FILES = max(2, os.cpu_count() or 1)
 
 
 def merge_midi_files(midi_paths, output_path, overlap_seconds=0.5):
     """
     Concatenate multiple MIDI files into a single MIDI file with overlap.
     
+    Uses symusic when it is installed and falls back to pretty_midi otherwise.
+    
     Args:
         midi_paths: List of paths to MIDI files to concatenate
         output_path: Path where the merged MIDI file will be saved
@@ -18,16 +32,269 @@ def merge_midi_files(midi_paths, output_path, overlap_seconds=0.5):
     if not midi_paths:
         raise ValueError("No MIDI files provided")
     
+    if SYMUSIC_AVAILABLE:
+        _merge_with_symusic(midi_paths, output_path, overlap_seconds)
+    else:
+        _merge_with_pretty_midi(midi_paths, output_path, overlap_seconds)
+
+
+def _merge_with_symusic(midi_paths, output_path, overlap_seconds):
+    """
+    Concatenate MIDI files using symusic's native parser and writer.
+    
+    Scores are loaded in seconds so segments line up the same way as with
+    pretty_midi; each track is shifted in one native call instead of note
+    by note.
+    
+    Args:
+        midi_paths: List of paths to MIDI files to concatenate
+        output_path: Path where the merged MIDI file will be saved
+        overlap_seconds: Duration (in seconds) to overlap between segments
+    """
     # Load the first MIDI file as the base
-    merged_midi = pretty_midi.PrettyMIDI(midi_paths[0])
-    current_end_time = merged_midi.get_end_time()
+    merged_score = Score(midi_paths[0], ttype="second")
+    current_end_time = merged_score.end()
     
     print(f"Loaded {midi_paths[0]} (duration: {current_end_time:.2f}s)")
     print(f"Overlap between segments: {overlap_seconds:.2f}s")
     
+    # Merged tracks by (program, is_drum) so matching is a single lookup
+    track_index = {}
+    for track in merged_score.tracks:
+        track_index.setdefault((track.program, track.is_drum), track)
+    
     # Concatenate each subsequent MIDI file
     for midi_path in midi_paths[1:]:
-        midi = pretty_midi.PrettyMIDI(midi_path)
+        score = Score(midi_path, ttype="second")
+        midi_duration = score.end()
+        print(f"Loading {midi_path} (duration: {midi_duration:.2f}s)")
+        
+        # Calculate start time with overlap (start earlier than end of previous segment)
+        segment_start_time = max(0, current_end_time - overlap_seconds)
+        
+        for track in score.tracks:
+            # Shift notes, control changes and pitch bends together
+            track.shift_time(segment_start_time, inplace=True)
+            
+            key = (track.program, track.is_drum)
+            matching_track = track_index.get(key)
+            if matching_track is not None:
+                # Add events to existing track
+                matching_track.notes.extend(track.notes)
+                matching_track.controls.extend(track.controls)
+                matching_track.pitch_bends.extend(track.pitch_bends)
+            else:
+                # Add as new track
+                merged_score.tracks.append(track)
+                track_index[key] = merged_score.tracks[-1]
+        
+        # Update current end time (accounts for overlap)
+        current_end_time = segment_start_time + midi_duration
+    
+    # Save the merged MIDI file
+    merged_score.dump_midi(output_path)
+    print(f"\nMerged MIDI saved to: {output_path}")
+    print(f"Total duration: {merged_score.end():.2f}s")
+    print(f"Number of instruments: {len(merged_score.tracks)}")
+
+
+@dataclass
+class NoteArray:
+    """
+    Notes of one instrument stored as parallel numpy arrays.
+    
+    Used by the pretty_midi merge so shifting and concatenating segments are
+    whole-array operations; pretty_midi Note objects are only rebuilt once,
+    right before writing. Start and end times live in separate contiguous
+    buffers so each shift is an independent pass over one of them.
+    """
+    program: int
+    is_drum: bool
+    pitch: np.ndarray     # int8
+    velocity: np.ndarray  # int8
+    start: np.ndarray     # float64, seconds
+    end: np.ndarray       # float64, seconds
+    
+    @classmethod
+    def from_instrument(cls, instrument):
+        """
+        Build a NoteArray from a pretty_midi.Instrument.
+        
+        Args:
+            instrument: pretty_midi.Instrument to read notes from
+            
+        Returns:
+            NoteArray: The instrument's notes, in the same order
+        """
+        notes = instrument.notes
+        count = len(notes)
+        return cls(
+            program=instrument.program,
+            is_drum=instrument.is_drum,
+            pitch=np.fromiter((n.pitch for n in notes), dtype=np.int8, count=count),
+            velocity=np.fromiter((n.velocity for n in notes), dtype=np.int8, count=count),
+            start=np.fromiter((n.start for n in notes), dtype=np.float64, count=count),
+            end=np.fromiter((n.end for n in notes), dtype=np.float64, count=count)
+        )
+    
+    @classmethod
+    def concatenate(cls, arrays):
+        """
+        Join several NoteArrays of the same instrument, in order.
+        
+        Args:
+            arrays: List of NoteArray (program and is_drum taken from the first)
+            
+        Returns:
+            NoteArray: All notes in a single set of arrays
+        """
+        return cls(
+            program=arrays[0].program,
+            is_drum=arrays[0].is_drum,
+            pitch=np.concatenate([a.pitch for a in arrays]),
+            velocity=np.concatenate([a.velocity for a in arrays]),
+            start=np.concatenate([a.start for a in arrays]),
+            end=np.concatenate([a.end for a in arrays])
+        )
+    
+    def shift(self, dt):
+        """
+        Shift every note by dt seconds in place.
+        
+        Args:
+            dt: Offset in seconds
+        """
+        # Two independent passes rather than one loop updating both fields
+        shift = _get_shift()
+        shift(self.start, float(dt))
+        shift(self.end, float(dt))
+    
+    def to_notes(self):
+        """
+        Materialize the notes as pretty_midi Note objects.
+        
+        Returns:
+            list: pretty_midi.Note objects, in array order
+        """
+        import pretty_midi
+        
+        return [
+            pretty_midi.Note(velocity, pitch, start, end)
+            for pitch, velocity, start, end in zip(
+                self.pitch.tolist(), self.velocity.tolist(),
+                self.start.tolist(), self.end.tolist()
+            )
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_shift():
+    """
+    Get the in-place array shift kernel, compiling it with numba on first use.
+    
+    Only the pretty_midi path needs it, so numba isn't imported (and nothing is
+    compiled) when symusic does the merge.
+    
+    Returns:
+        callable: Function (arr, dt) adding dt to every element of a
+        contiguous float64 array in place
+    """
+    try:
+        import numba
+    except ImportError:
+        def _shift(arr, dt):
+            """Add dt to every element of a float64 array in place."""
+            arr += dt
+        return _shift
+    
+    # float64[::1] declares a C-contiguous array, so the loop has unit stride
+    # and no loop-carried state and LLVM can vectorize it
+    @numba.njit("void(float64[::1], float64)", cache=True, fastmath=True, boundscheck=False)
+    def _shift(arr, dt):
+        """Add dt to every element of a contiguous float64 array in place (compiled)."""
+        for i in range(arr.shape[0]):
+            arr[i] += dt
+    return _shift
+
+
+def _shift_events(events, dt):
+    """
+    Shift the time of every control change or pitch bend in a list by dt.
+    
+    Args:
+        events: List of pretty_midi.ControlChange or pretty_midi.PitchBend
+        dt: Offset in seconds
+    """
+    if events:
+        times = np.fromiter((e.time for e in events), dtype=np.float64, count=len(events))
+        _get_shift()(times, float(dt))
+        for event, time in zip(events, times.tolist()):
+            event.time = time
+
+
+def _combine_events(target, sources):
+    """
+    Append the control changes and pitch bends of several instruments to a target.
+    
+    Each event list is allocated once at its final size and filled by
+    slice, rather than grown by repeated extend() calls.
+    
+    Args:
+        target: pretty_midi.Instrument receiving the events
+        sources: List of pretty_midi.Instrument whose events are appended, in order
+    """
+    for field in ('control_changes', 'pitch_bends'):
+        existing = getattr(target, field)
+        total = len(existing) + sum(len(getattr(src, field)) for src in sources)
+        combined = [None] * total
+        cursor = len(existing)
+        combined[:cursor] = existing
+        for src in sources:
+            events = getattr(src, field)
+            combined[cursor:cursor + len(events)] = events
+            cursor += len(events)
+        setattr(target, field, combined)
+
+
+def _merge_with_pretty_midi(midi_paths, output_path, overlap_seconds):
+    """
+    Concatenate MIDI files using pretty_midi.
+    
+    Args:
+        midi_paths: List of paths to MIDI files to concatenate
+        output_path: Path where the merged MIDI file will be saved
+        overlap_seconds: Duration (in seconds) to overlap between segments
+    """
+    # Imported here since only this fallback needs it
+    import pretty_midi
+    
+    # Parse all inputs up front. Files are independent, so parse them in
+    # parallel, but only when there are enough to repay the worker start-up
+    if len(midi_paths) >= PARALLEL_PARSE_MIN_FILES:
+        with ProcessPoolExecutor() as executor:
+            midis = list(executor.map(pretty_midi.PrettyMIDI, midi_paths, chunksize=8))
+    else:
+        midis = [pretty_midi.PrettyMIDI(path) for path in midi_paths]
+    
+    # Use the first MIDI file as the base
+    merged_midi = midis[0]
+    current_end_time = merged_midi.get_end_time()
+    
+    print(f"Loaded {midi_paths[0]} (duration: {current_end_time:.2f}s)")
+    print(f"Overlap between segments: {overlap_seconds:.2f}s")
+    
+    # Merged instruments by (program, is_drum) so matching is a single lookup
+    inst_index = {}
+    for instrument in merged_midi.instruments:
+        inst_index.setdefault((instrument.program, instrument.is_drum), instrument)
+    
+    # Instruments to fold into each merged instrument, combined once at the end
+    pending = {}
+    # Notes of each merged instrument that changes, as NoteArrays in order
+    note_parts = {}
+    
+    # Concatenate each subsequent MIDI file
+    for midi_path, midi in zip(midi_paths[1:], midis[1:]):
         midi_duration = midi.get_end_time()
         print(f"Loading {midi_path} (duration: {midi_duration:.2f}s)")
         
@@ -36,39 +303,35 @@ def merge_midi_files(midi_paths, output_path, overlap_seconds=0.5):
         
         # Shift all notes in this MIDI by the segment start time
         for instrument in midi.instruments:
-            # Shift all notes
-            for note in instrument.notes:
-                note.start += segment_start_time
-                note.end += segment_start_time
-            
-            # Shift all control changes
-            for control_change in instrument.control_changes:
-                control_change.time += segment_start_time
-            
-            # Shift all pitch bends
-            for pitch_bend in instrument.pitch_bends:
-                pitch_bend.time += segment_start_time
+            notes = NoteArray.from_instrument(instrument)
+            notes.shift(segment_start_time)
+            _shift_events(instrument.control_changes, segment_start_time)
+            _shift_events(instrument.pitch_bends, segment_start_time)
             
             # Find matching instrument in merged MIDI or create new one
-            matching_instrument = None
-            for merged_instrument in merged_midi.instruments:
-                if (merged_instrument.program == instrument.program and
-                    merged_instrument.is_drum == instrument.is_drum):
-                    matching_instrument = merged_instrument
-                    break
+            key = (instrument.program, instrument.is_drum)
+            matching_instrument = inst_index.get(key)
             
-            if matching_instrument:
-                # Add notes to existing instrument
-                matching_instrument.notes.extend(instrument.notes)
-                matching_instrument.control_changes.extend(instrument.control_changes)
-                matching_instrument.pitch_bends.extend(instrument.pitch_bends)
+            if matching_instrument is not None:
+                # Add notes to existing instrument (deferred)
+                pending.setdefault(key, []).append(instrument)
+                if key not in note_parts:
+                    note_parts[key] = [NoteArray.from_instrument(matching_instrument)]
+                note_parts[key].append(notes)
             else:
                 # Add as new instrument
                 merged_midi.instruments.append(instrument)
+                inst_index[key] = instrument
+                note_parts[key] = [notes]
         
         # Update current end time (accounts for overlap)
         current_end_time = segment_start_time + midi_duration
     
+    for key, sources in pending.items():
+        _combine_events(inst_index[key], sources)
+    for key, parts in note_parts.items():
+        inst_index[key].notes = NoteArray.concatenate(parts).to_notes()
+    
     # Save the merged MIDI file
     merged_midi.write(output_path)
     print(f"\nMerged MIDI saved to: {output_path}")
@@ -80,12 +343,16 @@ def main():
     midi_files_one = []
 
     midi_files_two = []
-    interpolation_files = sorted(os.listdir("outputs/piano_melodies/starling_five/2bar/interpolations/1to2/"))
-    for idx, file in enumerate(interpolation_files):
+    interpolation_files = sorted(
+        (entry for entry in os.scandir("outputs/piano_melodies/starling_five/2bar/interpolations/1to2/")
+         if entry.is_file() and entry.name.endswith('.mid')),
+        key=lambda entry: entry.name
+    )
+    for idx, entry in enumerate(interpolation_files):
         if idx <2:
-            midi_files_one.append(os.path.join("outputs/piano_melodies/starling_five/2bar/interpolations/1to2/", file))
+            midi_files_one.append(entry.path)
         else:
-            midi_files_two.append(os.path.join("outputs/piano_melodies/starling_five/2bar/interpolations/1to2/", file))
+            midi_files_two.append(entry.path)
     print(midi_files_one)
     print(midi_files_two)
     merge_midi_files(midi_files_one, "outputs/piano_melodies/starling_five/2bar/interpolations/1to2/full_sequence_with_interpolation_one.mid", overlap_seconds=0)
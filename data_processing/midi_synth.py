@@ -0,0 +1,255 @@
+"""
+Shared helpers for rendering MIDI files with a resident FluidSynth synthesizer.
+
+Used by convert_midi_to_wav.py and convert_vgmidi_to_mp3.py, which play
+mido-parsed files into a pyfluidsynth Synth instead of launching the
+FluidSynth executable per file.
+"""
+
+import os
+import ctypes
+try:
+    import fluidsynth
+    import mido
+    FLUIDSYNTH_BINDINGS_AVAILABLE = True
+except ImportError:
+    FLUIDSYNTH_BINDINGS_AVAILABLE = False
+
+_fluid_synth_channel_pressure = None
+_fluid_synth_key_pressure = None
+_fluid_synth_sysex = None
+if FLUIDSYNTH_BINDINGS_AVAILABLE:
+    try:
+        # pyfluidsynth doesn't wrap these, so bind them from the libfluidsynth it
+        # loaded (cfunc returns None if the library doesn't export the function)
+        _fluid_synth_channel_pressure = fluidsynth.cfunc(
+            'fluid_synth_channel_pressure', ctypes.c_int,
+            ('synth', ctypes.c_void_p, 1),
+            ('chan', ctypes.c_int, 1),
+            ('val', ctypes.c_int, 1)
+        )
+        _fluid_synth_key_pressure = fluidsynth.cfunc(
+            'fluid_synth_key_pressure', ctypes.c_int,
+            ('synth', ctypes.c_void_p, 1),
+            ('chan', ctypes.c_int, 1),
+            ('key', ctypes.c_int, 1),
+            ('val', ctypes.c_int, 1)
+        )
+        _fluid_synth_sysex = fluidsynth.cfunc(
+            'fluid_synth_sysex', ctypes.c_int,
+            ('synth', ctypes.c_void_p, 1),
+            ('data', ctypes.c_char_p, 1),
+            ('len', ctypes.c_int, 1),
+            ('response', ctypes.c_char_p, 1),
+            ('response_len', ctypes.c_void_p, 1),
+            ('handled', ctypes.c_void_p, 1),
+            ('dryrun', ctypes.c_int, 1)
+        )
+    except (AttributeError, OSError):
+        pass
+
+
+# Output format of the synthesizer: 16-bit stereo PCM at this rate
+SAMPLE_RATE = 44100
+RENDER_BLOCK_FRAMES = 4096  # Frames synthesized per block
+
+# Read size used when preloading the SoundFont into the page cache
+WARM_READ_SIZE = 1 << 20
+
+# Per-worker synthesizer, created once by init_worker
+_worker_synth = None
+
+# 'MThd' + 4-byte length + 6-byte header body; real files also need a track
+MIDI_HEADER_SIZE = 14
+
+# After the last MIDI event, keep rendering until the synth falls silent
+# (released notes and reverb die away), but for no longer than this
+MAX_RELEASE_TAIL_SECONDS = 5.0
+
+
+def has_midi_header(midi_file):
+    """
+    Cheaply check that a file looks like a Standard MIDI File.
+    
+    Reads only the first bytes, so broken files are rejected before paying
+    for a FluidSynth launch and SoundFont load.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
+        
+    Returns:
+        bool: True if the file is large enough and starts with 'MThd'
+    """
+    try:
+        if os.path.getsize(midi_file) <= MIDI_HEADER_SIZE:
+            return False
+        with open(midi_file, 'rb') as f:
+            return f.read(4) == b'MThd'
+    except OSError:
+        return False
+
+
+def remove_partial_output(output_file):
+    """Delete a partially written output file so it isn't mistaken for a finished one."""
+    if os.path.exists(output_file):
+        try:
+            os.unlink(output_file)
+        except Exception:
+            pass
+
+
+def warm_page_cache(path):
+    """
+    Read a file once so later opens are served from the OS page cache.
+    
+    Called on the SoundFont before the worker pool starts, so every worker
+    loads it from memory instead of each paying for a cold disk read.
+    
+    Args:
+        path (str): Path to the file to preload
+    """
+    buffer = bytearray(WARM_READ_SIZE)
+    with open(path, 'rb', buffering=0) as f:
+        while f.readinto(buffer):
+            pass
+
+
+def create_synth(soundfont):
+    """
+    Create a synthesizer with the SoundFont loaded.
+    
+    Only the samples a file actually plays are kept resident in memory,
+    rather than a full copy of the SoundFont per synthesizer.
+    
+    Args:
+        soundfont (str): Path to SoundFont file (.sf2)
+        
+    Returns:
+        fluidsynth.Synth: Synthesizer running at SAMPLE_RATE
+    """
+    synth = fluidsynth.Synth(
+        samplerate=float(SAMPLE_RATE),
+        **{'synth.dynamic-sample-loading': 1}
+    )
+    synth.sfload(soundfont, update_midi_preset=1)
+    return synth
+
+
+def init_worker(soundfont):
+    """
+    Pool initializer: load the SoundFont once for this worker process.
+    
+    Does nothing if pyfluidsynth or mido isn't installed, in which case
+    get_worker_synth() returns None and callers fall back to the executable.
+    
+    Args:
+        soundfont (str): Path to SoundFont file (.sf2)
+    """
+    global _worker_synth
+    if FLUIDSYNTH_BINDINGS_AVAILABLE:
+        _worker_synth = create_synth(soundfont)
+
+
+def get_worker_synth():
+    """
+    Get the synthesizer created by init_worker in this process.
+    
+    Returns:
+        fluidsynth.Synth or None: The worker's synthesizer, if any
+    """
+    return _worker_synth
+
+
+def load_midi(midi_file):
+    """
+    Parse a MIDI file for render_midi.
+    
+    Args:
+        midi_file (str): Path to the MIDI file
+        
+    Returns:
+        mido.MidiFile: Parsed file
+    """
+    return mido.MidiFile(midi_file)
+
+
+def send_to_synth(synth, msg):
+    """
+    Forward a mido message to the synthesizer.
+    
+    Notes, program and control changes, pitch bend, channel and key pressure
+    (aftertouch) and SysEx are forwarded. pyfluidsynth has no methods for the
+    last three, so they go straight to libfluidsynth, and are skipped if the
+    installed library doesn't provide them. Other message types (e.g. MIDI
+    clock, song position) don't affect the rendered audio and are ignored.
+    
+    Args:
+        synth: fluidsynth.Synth instance
+        msg: mido.Message to play
+    """
+    if msg.type == 'note_on':
+        synth.noteon(msg.channel, msg.note, msg.velocity)
+    elif msg.type == 'note_off':
+        synth.noteoff(msg.channel, msg.note)
+    elif msg.type == 'program_change':
+        synth.program_change(msg.channel, msg.program)
+    elif msg.type == 'control_change':
+        synth.cc(msg.channel, msg.control, msg.value)
+    elif msg.type == 'pitchwheel':
+        synth.pitch_bend(msg.channel, msg.pitch)
+    elif msg.type == 'aftertouch':
+        if _fluid_synth_channel_pressure is not None:
+            _fluid_synth_channel_pressure(synth.synth, msg.channel, msg.value)
+    elif msg.type == 'polytouch':
+        if _fluid_synth_key_pressure is not None:
+            _fluid_synth_key_pressure(synth.synth, msg.channel, msg.note, msg.value)
+    elif msg.type == 'sysex':
+        if _fluid_synth_sysex is not None:
+            # mido's data excludes the F0/F7 framing, as fluid_synth_sysex expects
+            data = bytes(msg.data)
+            _fluid_synth_sysex(synth.synth, data, len(data), None, None, None, 0)
+
+
+def render_midi(mid, synth, sample_rate=SAMPLE_RATE, block_frames=RENDER_BLOCK_FRAMES):
+    """
+    Play a parsed MIDI file into the synthesizer and yield the rendered audio.
+    
+    The synthesizer is reset first, so every file starts from a clean state
+    (notes, programs, controllers). After the last event, rendering continues
+    until the output is silent (at most MAX_RELEASE_TAIL_SECONDS), so notes in
+    their release phase and effect tails aren't cut off.
+    
+    Args:
+        mid (mido.MidiFile): File to render
+        synth: fluidsynth.Synth with the SoundFont loaded
+        sample_rate (int): Output sample rate of the synthesizer (default: SAMPLE_RATE)
+        block_frames (int): Maximum frames synthesized per block
+            (default: RENDER_BLOCK_FRAMES)
+        
+    Yields:
+        bytes: Interleaved 16-bit stereo PCM, at most block_frames frames each
+    """
+    synth.system_reset()
+    
+    elapsed = 0.0
+    frames_written = 0
+    for msg in mid:
+        elapsed += msg.time
+        # Track the absolute position so rounding doesn't drift
+        frames = int(round(elapsed * sample_rate)) - frames_written
+        while frames > 0:
+            block = min(frames, block_frames)
+            yield synth.get_samples(block).tobytes()
+            frames -= block
+            frames_written += block
+        if not msg.is_meta:
+            send_to_synth(synth, msg)
+    
+    # Let released notes and reverb ring out
+    tail_frames = int(MAX_RELEASE_TAIL_SECONDS * sample_rate)
+    while tail_frames > 0:
+        samples = synth.get_samples(min(block_frames, tail_frames))
+        yield samples.tobytes()
+        tail_frames -= len(samples) // 2
+        if not samples.any():
+            break
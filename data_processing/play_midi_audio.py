@@ -16,35 +16,182 @@ Configuration:
     
 Dependencies:
     - pygame (required)
+    - numpy (required)
     - mido (optional, for MIDI duration and measure-based start)
     - mutagen (optional, for audio file duration info)
 """
 
 import sys
 import os
+import atexit
 import csv
 import time
+import pickle
+import hashlib
 import tempfile
-import pygame
-try:
-    import mido
-    MIDO_AVAILABLE = True
-except ImportError:
-    MIDO_AVAILABLE = False
+import functools
+import importlib
+import importlib.util
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# pygame, mido and mutagen are imported on first use rather than at startup;
+# only check here whether the optional ones are installed
+MIDO_AVAILABLE = importlib.util.find_spec('mido') is not None
+MUTAGEN_AVAILABLE = importlib.util.find_spec('mutagen') is not None
+
+_mido = None
+_mutagen_file = None
+
+# Where per-file MIDI analysis results are kept between runs
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'play_midi_audio')
+# Least recently used entries beyond this many are deleted
+CACHE_MAX_ENTRIES = 512
+
+# Longest single wait on the pygame event queue. The wait blocks in C, and
+# Python only raises KeyboardInterrupt once it returns, so Ctrl+C is noticed
+# within this many milliseconds
+WAIT_SLICE_MS = 250
+
+
+def _get_mido():
+    """
+    Import mido on first use.
     
-try:
-    from mutagen import File as MutagenFile
-    MUTAGEN_AVAILABLE = True
-except ImportError:
-    MUTAGEN_AVAILABLE = False
+    Returns:
+        module: The mido module
+    """
+    global _mido
+    if _mido is None:
+        _mido = importlib.import_module('mido')
+    return _mido
 
 
-def get_midi_tempo(midi_file):
+def _get_mutagen():
+    """
+    Import mutagen on first use.
+    
+    Returns:
+        function: mutagen.File
+    """
+    global _mutagen_file
+    if _mutagen_file is None:
+        _mutagen_file = importlib.import_module('mutagen').File
+    return _mutagen_file
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_salt():
+    """
+    Fingerprint this module's source for the disk cache keys.
+    
+    Any edit to the analysis code changes the salt, so results written by an
+    older version of this script are never read back.
+    
+    Returns:
+        str: Hex digest of this file, or '' if it can't be read
+    """
+    try:
+        with open(__file__, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ''
+
+
+def _prune_cache():
+    """Delete the least recently used cache entries beyond CACHE_MAX_ENTRIES."""
+    entries = []
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass  # Removed by another worker
+    except OSError:
+        return
+    
+    if len(entries) <= CACHE_MAX_ENTRIES:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _disk_cache(func):
+    """
+    Cache the result of a per-MIDI-file function on disk between runs.
+    
+    Results are keyed by the function name, the script's source, and the
+    file's path, modification time and size, so an edited file (or an edited
+    script) is analyzed again. Reading an entry refreshes its modification
+    time, and the directory is pruned back to CACHE_MAX_ENTRIES after each
+    write. None (failure) is never cached, and any cache read/write problem
+    just falls through to calling the function.
+    
+    Args:
+        func: Function taking the MIDI file path as its first argument
+        
+    Returns:
+        function: Wrapped function
+    """
+    @functools.wraps(func)
+    def wrapper(midi_file, *args, **kwargs):
+        try:
+            stat = os.stat(midi_file)
+        except OSError:
+            return func(midi_file, *args, **kwargs)
+        
+        key = repr((_cache_salt(), func.__name__, os.path.abspath(midi_file),
+                    stat.st_mtime_ns, stat.st_size))
+        cache_path = os.path.join(CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+        try:
+            with open(cache_path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(cache_path)  # Mark as recently used for pruning
+            return result
+        except Exception:
+            pass
+        
+        result = func(midi_file, *args, **kwargs)
+        if result is not None:
+            temp_path = None
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                # Write then rename so readers never see a partial file
+                with tempfile.NamedTemporaryFile(
+                    mode='wb', dir=CACHE_DIR, suffix='.tmp', delete=False
+                ) as f:
+                    temp_path = f.name
+                    pickle.dump(result, f)
+                os.replace(temp_path, cache_path)
+                temp_path = None
+                _prune_cache()
+            except Exception:
+                pass
+            finally:
+                # Don't leave a half-written temp file behind
+                if temp_path is not None:
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
+        return result
+    
+    return wrapper
+
+
+def get_midi_tempo(midi_file, mid=None):
     """
     Get the tempo (BPM) from a MIDI file.
     
     Args:
         midi_file (str): Path to MIDI file
+        mid (mido.MidiFile): Already-parsed file, to avoid parsing it again
         
     Returns:
         float: Tempo in BPM, or None if unable to determine
@@ -53,7 +200,9 @@ def get_midi_tempo(midi_file):
         return None
     
     try:
-        mid = mido.MidiFile(midi_file)
+        mido = _get_mido()
+        if mid is None:
+            mid = mido.MidiFile(midi_file)
         
         # Search for tempo in all tracks
         for track in mid.tracks:
@@ -70,12 +219,13 @@ def get_midi_tempo(midi_file):
         return None
 
 
-def get_midi_time_signature(midi_file):
+def get_midi_time_signature(midi_file, mid=None):
     """
     Get the time signature from a MIDI file.
     
     Args:
         midi_file (str): Path to MIDI file
+        mid (mido.MidiFile): Already-parsed file, to avoid parsing it again
         
     Returns:
         tuple: (numerator, denominator) or None if unable to determine
@@ -84,7 +234,9 @@ def get_midi_time_signature(midi_file):
         return None
     
     try:
-        mid = mido.MidiFile(midi_file)
+        mido = _get_mido()
+        if mid is None:
+            mid = mido.MidiFile(midi_file)
         
         # Search for time signature in all tracks
         for track in mid.tracks:
@@ -99,23 +251,27 @@ def get_midi_time_signature(midi_file):
         return None
 
 
-def get_audio_duration(audio_file):
+def get_audio_duration(audio_file, mid=None):
     """
     Get the duration of an audio file in seconds.
     
     Args:
         audio_file (str): Path to the audio file
+        mid (mido.MidiFile): Already-parsed MIDI file, to avoid parsing it again
         
     Returns:
         float: Duration in seconds, or None if unable to determine
     """
+    if mid is not None:
+        return mid.length
+    
     file_ext = os.path.splitext(audio_file)[1].lower()
     
     # For MIDI files, use mido if available
     if file_ext in ('.mid', '.midi'):
         if MIDO_AVAILABLE:
             try:
-                mid = mido.MidiFile(audio_file)
+                mid = _get_mido().MidiFile(audio_file)
                 return mid.length
             except Exception as e:
                 print(f"Warning: Could not get MIDI duration with mido: {e}")
@@ -125,7 +281,7 @@ def get_audio_duration(audio_file):
     # For other audio formats, try mutagen
     if MUTAGEN_AVAILABLE:
         try:
-            audio = MutagenFile(audio_file)
+            audio = _get_mutagen()(audio_file)
             if audio is not None and hasattr(audio.info, 'length'):
                 return audio.info.length
         except Exception as e:
@@ -155,12 +311,29 @@ def format_duration(seconds):
     return f"{minutes}:{secs:02d}"
 
 
-def get_midi_measures(midi_file):
+def get_temp_dir():
+    """
+    Get a directory for short-lived temporary files.
+    
+    Prefers an in-memory filesystem (/dev/shm on Linux) so temporary files
+    never hit persistent storage, falling back to the system temp directory.
+    
+    Returns:
+        str: Path to the temporary directory
+    """
+    shm_dir = '/dev/shm'
+    if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK):
+        return shm_dir
+    return tempfile.gettempdir()
+
+
+def get_midi_measures(midi_file, mid=None):
     """
     Get measure boundaries (in seconds) from a MIDI file.
     
     Args:
         midi_file (str): Path to MIDI file
+        mid (mido.MidiFile): Already-parsed file, to avoid parsing it again
         
     Returns:
         list: List of measure start times in seconds, or None if unable to parse
@@ -169,7 +342,9 @@ def get_midi_measures(midi_file):
         return None
     
     try:
-        mid = mido.MidiFile(midi_file)
+        mido = _get_mido()
+        if mid is None:
+            mid = mido.MidiFile(midi_file)
         
         # Find time signature (default to 4/4)
         numerator = 4
@@ -189,51 +364,42 @@ def get_midi_measures(midi_file):
         ticks_per_beat = mid.ticks_per_beat
         ticks_per_measure = ticks_per_beat * numerator * (4 / denominator)
         
-        # Track tempo changes and calculate measure boundaries
-        tempo = 500000  # Default tempo (120 BPM)
-        current_tick = 0
-        current_time = 0.0
-        measures = [0.0]  # First measure starts at 0
-        
-        # Merge all tracks to get tempo changes
+        # Collect tempo changes from all tracks; merge_tracks yields them
+        # already in time order, so no separate sort is needed
         events = []
-        for track in mid.tracks:
-            tick = 0
-            for msg in track:
-                tick += msg.time
-                if msg.type == 'set_tempo':
-                    events.append((tick, msg.tempo))
+        tick = 0
+        for msg in mido.merge_tracks(mid.tracks):
+            tick += msg.time
+            if msg.type == 'set_tempo':
+                events.append((tick, msg.tempo))
+        
+        num_measures = int(np.ceil(mid.length * ticks_per_beat * 2 / ticks_per_measure))  # Some buffer
+        
+        if not events or (len(events) == 1 and events[0][0] == 0):
+            # Constant tempo (the usual case): measures are evenly spaced
+            tempo = events[0][1] if events else 500000  # Default tempo (120 BPM)
+            sec_per_measure = ticks_per_measure * tempo / (ticks_per_beat * 1e6)
+            times = np.arange(1, num_measures + 1) * sec_per_measure
+        else:
+            # Tempo segments: segment i starts at seg_ticks[i] and plays at
+            # seg_tempos[i] (default 120 BPM before the first tempo change)
+            seg_ticks = np.array([0] + [tick for tick, _ in events], dtype=np.float64)
+            seg_tempos = np.array([500000] + [tempo for _, tempo in events], dtype=np.float64)
+            sec_per_tick = seg_tempos / (ticks_per_beat * 1e6)
+            # Time in seconds at which each segment starts (prefix sum)
+            seg_starts = np.concatenate(([0.0], np.cumsum(np.diff(seg_ticks) * sec_per_tick[:-1])))
+            
+            # Calculate all measure times at once
+            measure_ticks = np.arange(1, num_measures + 1) * ticks_per_measure
+            seg = np.searchsorted(seg_ticks, measure_ticks, side='right') - 1
+            times = seg_starts[seg] + (measure_ticks - seg_ticks[seg]) * sec_per_tick[seg]
         
-        events.sort()
+        # Stop after the first measure that exceeds the file length
+        past_end = np.flatnonzero(times > mid.length + 10)  # Add some buffer
+        if past_end.size:
+            times = times[:past_end[0] + 1]
         
-        # Calculate measure times
-        tempo_idx = 0
-        current_measure_tick = 0
-        
-        while current_tick < mid.length * mid.ticks_per_beat * 2:  # Some buffer
-            next_measure_tick = current_measure_tick + ticks_per_measure
-            
-            # Check for tempo changes before next measure
-            while tempo_idx < len(events) and events[tempo_idx][0] <= next_measure_tick:
-                tempo_tick, new_tempo = events[tempo_idx]
-                # Add time elapsed at current tempo
-                tick_diff = tempo_tick - current_tick
-                current_time += mido.tick2second(tick_diff, mid.ticks_per_beat, tempo)
-                current_tick = tempo_tick
-                tempo = new_tempo
-                tempo_idx += 1
-            
-            # Add time to next measure
-            tick_diff = next_measure_tick - current_tick
-            current_time += mido.tick2second(tick_diff, mid.ticks_per_beat, tempo)
-            current_tick = next_measure_tick
-            current_measure_tick = next_measure_tick
-            
-            measures.append(current_time)
-            
-            # Stop if we've exceeded the file length
-            if current_time > mid.length + 10:  # Add some buffer
-                break
+        measures = [0.0] + times.tolist()  # First measure starts at 0
         
         return measures
         
@@ -242,13 +408,42 @@ def get_midi_measures(midi_file):
         return None
 
 
-def create_midi_from_measure(midi_file, start_measure):
+def _track_message_times(track, ticks_per_beat):
+    """
+    Get the time (in seconds) of every message in a MIDI track.
+    
+    Each delta is scaled by the tempo in effect before that message, using
+    the track's own set_tempo events, and the results are summed with one
+    cumulative sum instead of a tick2second call per message.
+    
+    Args:
+        track (mido.MidiTrack): Track to scan
+        ticks_per_beat (int): Resolution of the MIDI file
+        
+    Returns:
+        numpy.ndarray: Absolute message times in seconds (non-decreasing)
+    """
+    deltas = np.fromiter((msg.time for msg in track), dtype=np.float64, count=len(track))
+    tempo_changes = [(i, msg.tempo) for i, msg in enumerate(track) if msg.type == 'set_tempo']
+    tempo_positions = np.array([i for i, _ in tempo_changes], dtype=np.int64)
+    tempos = np.array([500000] + [tempo for _, tempo in tempo_changes], dtype=np.float64)
+    
+    # Index (+1) of the last set_tempo strictly before each message; 0 = default
+    tempo_idx = np.searchsorted(tempo_positions, np.arange(len(track)), side='left')
+    sec_per_tick = tempos[tempo_idx] * 1e-6 / ticks_per_beat
+    return np.cumsum(deltas * sec_per_tick)
+
+
+def create_midi_from_measure(midi_file, start_measure, mid=None, measures=None):
     """
     Create a temporary MIDI file starting from a specific measure.
     
     Args:
         midi_file (str): Path to original MIDI file
         start_measure (int): 0-indexed measure to start from
+        mid (mido.MidiFile): Already-parsed file, to avoid parsing it again
+        measures (list): Measure start times from get_midi_measures, to avoid
+            computing them again
         
     Returns:
         str: Path to temporary MIDI file, or None if unable to create
@@ -258,48 +453,42 @@ def create_midi_from_measure(midi_file, start_measure):
         return None
     
     try:
-        measures = get_midi_measures(midi_file)
+        mido = _get_mido()
+        if mid is None:
+            mid = mido.MidiFile(midi_file)
+        if measures is None:
+            measures = get_midi_measures(midi_file, mid)
         if measures is None or start_measure >= len(measures):
             print(f"Warning: Cannot start from measure {start_measure}")
             return None
         
         start_time = measures[start_measure]
-        mid = mido.MidiFile(midi_file)
+        
+        # Message times for every track, computed once and shared by both passes
+        track_times = [_track_message_times(track, mid.ticks_per_beat) for track in mid.tracks]
         
         # First pass: find the active tempo, time signature, and key at start_time
         active_tempo = 500000  # Default
         active_time_sig = None
         active_key_sig = None
         
-        for track in mid.tracks:
-            current_time = 0.0
-            tempo = 500000
+        for track, times in zip(mid.tracks, track_times):
+            # Messages at or before start_time form a prefix of the track
+            cut = int(np.searchsorted(times, start_time, side='right'))
             
-            for msg in track:
-                current_time += mido.tick2second(msg.time, mid.ticks_per_beat, tempo)
-                
+            for msg in track[:cut]:
                 if msg.type == 'set_tempo':
-                    tempo = msg.tempo
-                    if current_time <= start_time:
-                        active_tempo = msg.tempo
-                
-                if msg.type == 'time_signature' and current_time <= start_time:
+                    active_tempo = msg.tempo
+                elif msg.type == 'time_signature':
                     active_time_sig = msg.copy(time=0)
-                
-                if msg.type == 'key_signature' and current_time <= start_time:
+                elif msg.type == 'key_signature':
                     active_key_sig = msg.copy(time=0)
-                
-                if current_time > start_time:
-                    break
         
         # Create new MIDI file
         new_mid = mido.MidiFile(ticks_per_beat=mid.ticks_per_beat, type=mid.type)
         
-        for track_idx, track in enumerate(mid.tracks):
+        for track_idx, (track, times) in enumerate(zip(mid.tracks, track_times)):
             new_track = mido.MidiTrack()
-            current_time = 0.0
-            tempo = 500000  # For time calculations
-            first_message = True
             
             # Add initial meta messages (tempo, time sig, key sig) to first track
             if track_idx == 0 or mid.type == 1:  # Type 1 = simultaneous tracks
@@ -310,33 +499,28 @@ def create_midi_from_measure(midi_file, start_measure):
                 if active_tempo != 500000:  # Only add if not default
                     new_track.append(mido.MetaMessage('set_tempo', tempo=active_tempo, time=0))
             
-            for msg in track:
-                current_time += mido.tick2second(msg.time, mid.ticks_per_beat, tempo)
+            # Include messages at or after start time (a suffix of the track)
+            first = int(np.searchsorted(times, start_time, side='left'))
+            if first < len(track):
+                # Calculate time from start for first message
+                delta_seconds = times[first] - start_time
+                delta_ticks = mido.second2tick(
+                    delta_seconds,
+                    mid.ticks_per_beat,
+                    active_tempo  # Use active tempo at start!
+                )
+                new_track.append(track[first].copy(time=int(delta_ticks)))
                 
-                if msg.type == 'set_tempo':
-                    tempo = msg.tempo
-                
-                # Include messages at or after start time
-                if current_time >= start_time:
-                    if first_message:
-                        # Calculate time from start for first message
-                        delta_seconds = current_time - start_time
-                        delta_ticks = mido.second2tick(
-                            delta_seconds,
-                            mid.ticks_per_beat,
-                            active_tempo  # Use active tempo at start!
-                        )
-                        new_msg = msg.copy(time=int(delta_ticks))
-                        first_message = False
-                    else:
-                        new_msg = msg.copy()
-                    
-                    new_track.append(new_msg)
+                # The rest keep their delta times, so they are reused as-is
+                # (the new file is only saved, never modified)
+                new_track.extend(track[first + 1:])
             
             new_mid.tracks.append(new_track)
         
         # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(mode='wb', suffix='.mid', delete=False)
+        temp_file = tempfile.NamedTemporaryFile(
+            mode='wb', suffix='.mid', delete=False, dir=get_temp_dir()
+        )
         new_mid.save(temp_file.name)
         temp_file.close()
         
@@ -349,7 +533,91 @@ def create_midi_from_measure(midi_file, start_measure):
         return None
 
 
-def play_midi(audio_file, start_measure=0, play_for=None):
+@functools.lru_cache(maxsize=64)
+@_disk_cache
+def _load_midi(midi_file, mtime):
+    """
+    Gather everything play_midi reports about a MIDI file.
+    
+    The results are cached in memory and on disk, so the file is only parsed
+    the first time it is seen (or after it changes). The modification time is
+    part of the in-memory cache key, so a file that changes on disk is parsed
+    again instead of served stale.
+    
+    Args:
+        midi_file (str): Path to MIDI file
+        mtime (float): Modification time of midi_file
+        
+    Returns:
+        tuple: (tempo, time_sig, measures, length)
+    """
+    mid = _get_mido().MidiFile(midi_file)
+    return (
+        get_midi_tempo(midi_file, mid),
+        get_midi_time_signature(midi_file, mid),
+        get_midi_measures(midi_file, mid),
+        mid.length
+    )
+
+
+def init_mixer():
+    """
+    Initialize the pygame mixer if it isn't already.
+    
+    The mixer is opened once and shared by every track in the playlist,
+    and shut down when the interpreter exits. When SDL's video subsystem is
+    available, the end of playback is reported through the music end event
+    so callers can block on the event queue instead of polling. Without a
+    display (headless, SSH, WSL) the event queue can't be used, and
+    play_midi polls the mixer instead.
+    """
+    import pygame
+    
+    if pygame.mixer.get_init() is None:
+        freq = 44100  # Audio CD quality
+        bitsize = -16  # Unsigned 16 bit
+        channels = 2  # 1 is mono, 2 is stereo
+        buffer = 1024  # Number of samples
+        pygame.mixer.init(freq, bitsize, channels, buffer)
+        # Starts the event queue used to wait for playback to end; this
+        # quietly leaves the display uninitialized when there is none
+        pygame.init()
+        atexit.register(pygame.quit)
+        
+        if pygame.display.get_init():
+            # Only wake up for the end of playback
+            pygame.event.set_blocked(None)
+            music_end_event = pygame.USEREVENT + 1
+            pygame.event.set_allowed([music_end_event])
+            pygame.mixer.music.set_endevent(music_end_event)
+        
+        # Optional: Set volume (0.0 to 1.0)
+        pygame.mixer.music.set_volume(0.8)
+
+
+def probe_duration(audio_file):
+    """
+    Get the duration of a playlist entry ahead of playback.
+    
+    MIDI files go through _load_midi, so the analysis is cached and reused
+    when the file is played.
+    
+    Args:
+        audio_file (str): Path to the audio file
+        
+    Returns:
+        float: Duration in seconds, or None if unable to determine
+    """
+    file_ext = os.path.splitext(audio_file)[1].lower()
+    if file_ext in ('.mid', '.midi') and MIDO_AVAILABLE:
+        try:
+            return _load_midi(audio_file, os.path.getmtime(audio_file))[3]
+        except Exception:
+            pass  # get_audio_duration reports the problem
+    return get_audio_duration(audio_file)
+
+
+def play_midi(audio_file, start_measure=0, play_for=None, duration=None):
     """
     Play an audio file using pygame.
     
@@ -359,7 +627,10 @@ def play_midi(audio_file, start_measure=0, play_for=None):
         audio_file (str): Path to the audio file to play
         start_measure (int): 0-indexed measure to start playback from (MIDI only)
         play_for (float): Optional duration in seconds to play. If None, plays entire file.
+        duration (float): Duration probed ahead of time; looked up here if None
     """
+    import pygame
+    
     # Check if file exists
     if not os.path.exists(audio_file):
         print(f"Error: File '{audio_file}' not found. Skipping...")
@@ -370,22 +641,37 @@ def play_midi(audio_file, start_measure=0, play_for=None):
     file_ext = os.path.splitext(audio_file)[1].lower()
     is_midi = file_ext in ('.mid', '.midi')
     
-    if not audio_file.lower().endswith(supported_formats):
+    if file_ext not in supported_formats:
         print(f"Warning: '{audio_file}' may not be a supported audio format.")
         print(f"Supported formats: {', '.join(supported_formats)}")
     
+    # MIDI analysis comes from the cache once the file has been seen; the file
+    # itself is only parsed again below to start from a later measure
+    midi_info = None
+    if is_midi and MIDO_AVAILABLE:
+        try:
+            midi_info = _load_midi(audio_file, os.path.getmtime(audio_file))
+        except Exception as e:
+            print(f"Warning: Could not parse MIDI file: {e}")
+    
+    if midi_info:
+        tempo, time_sig, measures, midi_length = midi_info
+        if duration is None:
+            duration = midi_length
+    else:
+        tempo, time_sig, measures = None, None, None
+        if duration is None:
+            duration = get_audio_duration(audio_file)
+    
     # Get and display duration and measure info
-    duration = get_audio_duration(audio_file)
     duration_str = format_duration(duration)
     print(f"Duration: {duration_str}")
     
-    # Get and display tempo and time signature for MIDI files
+    # Display tempo and time signature for MIDI files
     if is_midi:
-        tempo = get_midi_tempo(audio_file)
         if tempo:
             print(f"Tempo: {tempo:.1f} BPM")
         
-        time_sig = get_midi_time_signature(audio_file)
         if time_sig:
             print(f"Time Signature: {time_sig[0]}/{time_sig[1]}")
     
@@ -395,11 +681,10 @@ def play_midi(audio_file, start_measure=0, play_for=None):
     
     if start_measure > 0:
         if is_midi:
-            measures = get_midi_measures(audio_file)
             if measures:
                 print(f"Total measures: {len(measures) - 1}")
                 print(f"Starting from measure: {start_measure}")
-                temp_file = create_midi_from_measure(audio_file, start_measure)
+                temp_file = create_midi_from_measure(audio_file, start_measure, measures=measures)
                 if temp_file:
                     file_to_play = temp_file
                 else:
@@ -409,15 +694,8 @@ def play_midi(audio_file, start_measure=0, play_for=None):
         else:
             print("Warning: Measure-based start only supported for MIDI files")
     
-    # Initialize pygame mixer
-    freq = 44100  # Audio CD quality
-    bitsize = -16  # Unsigned 16 bit
-    channels = 2  # 1 is mono, 2 is stereo
-    buffer = 1024  # Number of samples
-    pygame.mixer.init(freq, bitsize, channels, buffer)
-    
-    # Optional: Set volume (0.0 to 1.0)
-    pygame.mixer.music.set_volume(0.8)
+    # Normally already initialized by main() for the whole playlist
+    init_mixer()
     
     try:
         # Load the audio file
@@ -429,11 +707,17 @@ def play_midi(audio_file, start_measure=0, play_for=None):
             print(f"Playing for {play_for}s... (Press Ctrl+C to stop)")
         else:
             print("Playing... (Press Ctrl+C to stop)")
+        # The event queue needs a display; without one, poll the mixer
+        use_events = pygame.display.get_init()
+        if use_events:
+            # Drop end events left over from the previous track
+            music_end_event = pygame.mixer.music.get_endevent()
+            pygame.event.clear(music_end_event)
         pygame.mixer.music.play()
         
-        # Wait while the music plays
+        # Wait until the music ends (or the play_for limit is reached)
         start_time = time.time()
-        while pygame.mixer.music.get_busy():
+        while True:
             elapsed = time.time() - start_time
             
             # Stop if we've played for the specified duration
@@ -442,9 +726,19 @@ def play_midi(audio_file, start_measure=0, play_for=None):
                 print(f"\nPlayback stopped after {play_for}s")
                 break
             
-            time.sleep(0.1)  # Check more frequently for better timing
-        else:
-            print("\nPlayback completed!")
+            if use_events:
+                # Bounded slices, so Ctrl+C isn't held off until the track ends
+                wait_ms = WAIT_SLICE_MS
+                if play_for:
+                    wait_ms = min(wait_ms, max(1, int((play_for - elapsed) * 1000)))
+                if pygame.event.wait(wait_ms).type == music_end_event:
+                    print("\nPlayback completed!")
+                    break
+            else:
+                if not pygame.mixer.music.get_busy():
+                    print("\nPlayback completed!")
+                    break
+                time.sleep(0.1)
         
     except KeyboardInterrupt:
         print("\n\nPlayback stopped by user.")
@@ -454,8 +748,6 @@ def play_midi(audio_file, start_measure=0, play_for=None):
         print(f"Error playing audio file: {e}")
         print("Skipping to next file...")
     finally:
-        pygame.mixer.quit()
-        
         # Clean up temporary file
         if temp_file and os.path.exists(temp_file):
             try:
@@ -485,9 +777,12 @@ def main():
 
     # Add the interpolation MIDI file    
     # Sort interpolation files to ensure correct order (000, 001, 002, etc.)
-    interpolation_files = sorted(os.listdir("outputs/piano_melodies/window_blue_curtain/2bar"))
-    for file in interpolation_files:
-        audio_files.append((os.path.join("outputs/piano_melodies/window_blue_curtain/2bar", file), 0))
+    interpolation_files = sorted(
+        (entry for entry in os.scandir("outputs/piano_melodies/window_blue_curtain/2bar") if entry.is_file()),
+        key=lambda entry: entry.name
+    )
+    for entry in interpolation_files:
+        audio_files.append((entry.path, 0))
 
     # Optional: Set duration limit for faster testing (in seconds)
     # Set to None to play full files
@@ -498,12 +793,22 @@ def main():
         print(f"Playing {PLAY_DURATION}s of each track for testing\n")
     print(audio_files)
 
+    # Probe all durations concurrently up front instead of one per track
+    # right before it plays
+    unique_files = list(dict.fromkeys(
+        audio_file for audio_file, _ in audio_files if os.path.exists(audio_file)
+    ))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        durations = dict(zip(unique_files, executor.map(probe_duration, unique_files)))
+
+    init_mixer()
     try:
         for i, (audio_file, start_measure) in enumerate(audio_files, 1):
             print(f"\n{'='*60}")
             print(f"Track {i}/{len(audio_files)}")
             print(f"{'='*60}")
-            play_midi(audio_file, start_measure=int(start_measure), play_for=PLAY_DURATION)
+            play_midi(audio_file, start_measure=int(start_measure), play_for=PLAY_DURATION,
+                      duration=durations.get(audio_file))
         
         print(f"\n{'='*60}")
         print("All tracks completed!")
@@ -9,7 +9,25 @@ word count.
 
 import csv
 import os
-from typing import List, Dict, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function as plain Python."""
+        def decorator(func):
+            return func
+        return decorator
+
+
+# Buffer size for CSV reads and writes (larger than the 8 KiB default so
+# big story files take far fewer read/write calls)
+IO_BUFFER_SIZE = 1 << 20
 
 
 def count_words(text: str) -> int:
@@ -17,17 +35,78 @@ def count_words(text: str) -> int:
     return len(text.split())
 
 
-def partition_sentences(sentences: List[Dict], num_partitions: int) -> List[List[Dict]]:
+@dataclass
+class Sentence:
+    """
+    A clustered story sentence.
+    
+    The ID and predictions keep their CSV text so they are written back unchanged;
+    wc is the sentence's word count, computed once when the sentence is read.
+    """
+    __slots__ = ('id', 'text', 'v_pred', 'a_pred', 'wc')
+    
+    id: str
+    text: str
+    v_pred: str
+    a_pred: str
+    wc: int
+
+
+@njit(cache=True)
+def _smallest_feasible_cap(prefix_sums, k):
+    """
+    Find the smallest maximum partition word count achievable with k partitions.
+    
+    Binary searches the cap between its lower bound (the larger of the longest
+    sentence and an even k-way split) and the total, checking each candidate with
+    a greedy sequential split. Compiled with numba when it is installed.
+    
+    Args:
+        prefix_sums: int64 array of cumulative word counts, starting with 0
+        k: Number of partitions
+        
+    Returns:
+        Smallest cap for which the sentences fit in at most k partitions
+    """
+    n = len(prefix_sums) - 1
+    hi = prefix_sums[n]
+    # No cap can be below the longest sentence or below an even k-way split
+    lo = max(np.max(prefix_sums[1:] - prefix_sums[:-1]), (hi + k - 1) // k)
+    
+    while lo < hi:
+        cap = (lo + hi) // 2
+        
+        # Greedily count the partitions needed to stay within cap, jumping
+        # straight to the end of each partition with a search on the prefix sums
+        partitions_used = 0
+        start = 0
+        while start < n:
+            partitions_used += 1
+            if partitions_used > k:
+                # Already infeasible; the rest of the split cannot change that
+                break
+            start = np.searchsorted(prefix_sums, prefix_sums[start] + cap, side='right') - 1
+        
+        if partitions_used <= k:
+            hi = cap
+        else:
+            lo = cap + 1
+    
+    return lo
+
+
+def partition_sentences(sentences: List[Sentence], num_partitions: int) -> List[List[Sentence]]:
     """
     Partition sentences into sequential groups using the linear partition algorithm.
-    This minimizes the maximum word count across all partitions using dynamic programming.
+    This minimizes the maximum word count across all partitions by binary searching
+    the smallest word-count cap that a greedy sequential split can stay within.
     
     Args:
-        sentences: List of sentence dictionaries with 'text' field
+        sentences: List of sentences in story order
         num_partitions: Number of partitions to create
         
     Returns:
-        List of partitions, where each partition is a list of sentence dicts in sequential order
+        List of partitions, where each partition is a list of sentences in sequential order
     """
     if not sentences:
         return []
@@ -44,58 +123,131 @@ def partition_sentences(sentences: List[Dict], num_partitions: int) -> List[List
     if k == n:
         return [[sent] for sent in sentences]
     
-    # Calculate word count for each sentence
-    word_counts = [count_words(sent['text']) for sent in sentences]
-    
-    # Compute prefix sums for quick range sum queries
-    prefix_sums = [0]
-    for wc in word_counts:
-        prefix_sums.append(prefix_sums[-1] + wc)
-    
-    def range_sum(i, j):
-        """Sum of word counts from index i to j (inclusive)"""
-        return prefix_sums[j + 1] - prefix_sums[i]
-    
-    # DP table: dp[i][j] = minimum maximum partition sum for first i sentences using j partitions
-    dp = [[float('inf')] * (k + 1) for _ in range(n + 1)]
-    dp[0][0] = 0
-    
-    # Track partition points
-    splits = [[0] * (k + 1) for _ in range(n + 1)]
-    
-    # Fill DP table
-    for i in range(1, n + 1):
-        for j in range(1, min(i, k) + 1):
-            # Try all possible last partition starting points
-            for p in range(j - 1, i):
-                # Last partition is from p to i-1
-                last_partition_sum = range_sum(p, i - 1)
-                max_sum = max(dp[p][j - 1], last_partition_sum)
-                
-                if max_sum < dp[i][j]:
-                    dp[i][j] = max_sum
-                    splits[i][j] = p
-    
-    # Backtrack to find partition points
-    partition_points = []
-    curr = n
-    for j in range(k, 0, -1):
-        partition_points.append(curr)
-        curr = splits[curr][j]
-    partition_points.reverse()
-    
-    # Build partitions
-    partitions = []
-    start = 0
-    for end in partition_points:
-        partitions.append(sentences[start:end])
-        start = end
+    word_counts = [sent.wc for sent in sentences]
     
-    return partitions
+    prefix_sums = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(word_counts, out=prefix_sums[1:])
+    
+    # Binary search the smallest feasible maximum partition word count
+    cap = int(_smallest_feasible_cap(prefix_sums, k))
+    
+    # Greedy pass at the optimal cap to find exactly k partition points. Cut
+    # when the cap would be exceeded, or once the remaining sentences are only
+    # just enough to give every remaining partition one sentence each.
+    partition_points = [0]
+    current_sum = 0
+    for i, wc in enumerate(word_counts):
+        partitions_left = k - len(partition_points)
+        if i > 0 and (current_sum + wc > cap or n - i == partitions_left):
+            partition_points.append(i)
+            current_sum = wc
+        else:
+            current_sum += wc
+    partition_points.append(n)
+    
+    # Build partitions from consecutive (start, end) partition points
+    return [sentences[start:end] for start, end in zip(partition_points, partition_points[1:])]
+
+
+def partition_word_counts(partitions: List[List[Sentence]]) -> np.ndarray:
+    """
+    Word count of each partition, summed with a single np.add.reduceat.
+    
+    Args:
+        partitions: List of non-empty partitions of sentences
+        
+    Returns:
+        Array with the total word count of each partition
+    """
+    if not partitions:
+        return np.zeros(0, dtype=np.int64)
+    
+    sizes = [len(partition) for partition in partitions]
+    wc = np.fromiter(
+        (s.wc for partition in partitions for s in partition),
+        dtype=np.int64, count=sum(sizes)
+    )
+    starts = np.concatenate(([0], np.cumsum(sizes[:-1], dtype=np.int64)))
+    return np.add.reduceat(wc, starts)
+
+
+def load_clustered_sentences(clustered_csv: str) -> Tuple[List[Sentence], np.ndarray]:
+    """
+    Read all sentences from the clustered sentences CSV, ordered by ID.
+    
+    Args:
+        clustered_csv: Path to clustered sentences CSV
+        
+    Returns:
+        Tuple of (sentences sorted by ID, int64 array of their IDs in the same order)
+    """
+    with open(clustered_csv, 'r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = {name: i for i, name in enumerate(header)}
+        id_col, text_col = idx['ID'], idx['text']
+        v_col, a_col = idx.get('V_pred'), idx.get('A_pred')
+        
+        # Keep only the fields used downstream, with IDs converted once
+        rows = [
+            (int(row[id_col]), Sentence(
+                row[id_col],
+                row[text_col],
+                row[v_col] if v_col is not None else '',
+                row[a_col] if a_col is not None else '',
+                count_words(row[text_col])
+            ))
+            for row in reader
+        ]
+    
+    ids = np.fromiter((sent_id for sent_id, _ in rows), dtype=np.int64, count=len(rows))
+    order = np.argsort(ids, kind='stable')
+    all_sentences = [rows[i][1] for i in order.tolist()]
+    return all_sentences, ids[order]
+
+
+def sentences_in_range(all_sentences: List[Sentence], ids: np.ndarray,
+                       start_id: int, end_id: int) -> List[Sentence]:
+    """
+    Get the sentences whose IDs fall in [start_id, end_id] by binary search.
+    
+    Args:
+        all_sentences: Sentences sorted by ID (from load_clustered_sentences)
+        ids: Sorted int64 IDs matching all_sentences
+        start_id: Starting sentence ID (inclusive)
+        end_id: Ending sentence ID (inclusive)
+        
+    Returns:
+        List of sentences in ID order
+    """
+    lo = int(np.searchsorted(ids, start_id, side='left'))
+    hi = int(np.searchsorted(ids, end_id, side='right'))
+    return all_sentences[lo:hi]
+
+
+def read_cluster_stats(stats_csv: str) -> List[Tuple[str, int, int]]:
+    """
+    Read the cluster statistics CSV.
+    
+    Args:
+        stats_csv: Path to cluster statistics CSV
+        
+    Returns:
+        List of (cluster ID, start sentence ID, end sentence ID) in file order
+    """
+    with open(stats_csv, 'r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = {name: i for i, name in enumerate(header)}
+        cluster_col, start_col, end_col = idx['Cluster'], idx['Start_ID'], idx['End_ID']
+        return [
+            (row[cluster_col], int(row[start_col]), int(row[end_col]))
+            for row in reader
+        ]
 
 
 def segment_single_cluster(clustered_csv: str, cluster_id: str, start_id: int, 
-                           end_id: int, num_partitions: int) -> List[List[Dict]]:
+                           end_id: int, num_partitions: int) -> List[List[Sentence]]:
     """
     Segment a single cluster into equal-length partitions.
     
@@ -107,20 +259,26 @@ def segment_single_cluster(clustered_csv: str, cluster_id: str, start_id: int,
         num_partitions: Number of partitions to create
         
     Returns:
-        List of partitions, where each partition is a list of sentence dicts
+        List of partitions, where each partition is a list of sentences
     """
-    # Read all sentences
-    all_sentences = []
-    with open(clustered_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        all_sentences = list(reader)
-    
-    # Extract sentences for this cluster
-    cluster_sentences = [
-        sent for sent in all_sentences 
-        if start_id <= int(sent['ID']) <= end_id
-    ]
+    all_sentences, ids = load_clustered_sentences(clustered_csv)
+    cluster_sentences = sentences_in_range(all_sentences, ids, start_id, end_id)
+    return segment_single_cluster_from_list(cluster_sentences, cluster_id, num_partitions)
+
+
+def segment_single_cluster_from_list(cluster_sentences: List[Sentence], cluster_id: str,
+                                     num_partitions: int) -> List[List[Sentence]]:
+    """
+    Segment an already-selected cluster's sentences into equal-length partitions.
     
+    Args:
+        cluster_sentences: The cluster's sentences in sequential order
+        cluster_id: ID of the cluster to segment
+        num_partitions: Number of partitions to create
+        
+    Returns:
+        List of partitions, where each partition is a list of sentences
+    """
     if not cluster_sentences:
         print(f"Warning: No sentences found for cluster {cluster_id}")
         return []
@@ -128,20 +286,21 @@ def segment_single_cluster(clustered_csv: str, cluster_id: str, start_id: int,
     # Partition the sentences
     partitions = partition_sentences(cluster_sentences, num_partitions)
     
-    # Print summary
+    # Print summary (partitions cover every sentence, so their sum is the total)
+    word_counts = partition_word_counts(partitions).tolist()
     print(f"\nCluster {cluster_id} ({len(cluster_sentences)} sentences):")
-    total_words = sum(count_words(s['text']) for s in cluster_sentences)
+    total_words = sum(word_counts)
     print(f"  Total words: {total_words}")
     print(f"  Partitions: {len(partitions)}")
     
-    for i, partition in enumerate(partitions):
-        partition_words = sum(count_words(s['text']) for s in partition)
+    for i, (partition, partition_words) in enumerate(zip(partitions, word_counts)):
         print(f"    Partition {i+1}: {len(partition)} sentences, {partition_words} words")
     
     return partitions
 
 
-def segment_clusters(stats_csv: str, clustered_csv: str, num_partitions: int = 5) -> Dict:
+def segment_clusters(stats_csv: str, clustered_csv: str, num_partitions: int = 5,
+                     cluster_stats: Optional[List[Tuple[str, int, int]]] = None) -> Dict:
     """
     Segment clusters into equal-length partitions.
     
@@ -149,26 +308,24 @@ def segment_clusters(stats_csv: str, clustered_csv: str, num_partitions: int = 5
         stats_csv: Path to cluster statistics CSV
         clustered_csv: Path to clustered sentences CSV
         num_partitions: Number of partitions per cluster
+        cluster_stats: Already-read rows from read_cluster_stats(stats_csv), if available
         
     Returns:
         Dictionary mapping cluster ID to list of partitions
     """
-    # Read cluster statistics
-    cluster_stats = []
-    with open(stats_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        cluster_stats = list(reader)
+    # Read cluster statistics unless the caller already has them
+    if cluster_stats is None:
+        cluster_stats = read_cluster_stats(stats_csv)
+    
+    # Read the sentences once for all clusters
+    all_sentences, ids = load_clustered_sentences(clustered_csv)
     
     # Process each cluster
     results = {}
     
-    for cluster_info in cluster_stats:
-        cluster_id = cluster_info['Cluster']
-        start_id = int(cluster_info['Start_ID'])
-        end_id = int(cluster_info['End_ID'])
-        
-        partitions = segment_single_cluster(
-            clustered_csv, cluster_id, start_id, end_id, num_partitions
+    for cluster_id, start_id, end_id in cluster_stats:
+        partitions = segment_single_cluster_from_list(
+            sentences_in_range(all_sentences, ids, start_id, end_id), cluster_id, num_partitions
         )
         
         if partitions:
@@ -177,35 +334,27 @@ def segment_clusters(stats_csv: str, clustered_csv: str, num_partitions: int = 5
     return results
 
 
-def save_cluster_partitions(partitions: List[List[Dict]], output_dir: str, 
+def save_cluster_partitions(partitions: List[List[Sentence]], output_dir: str, 
                            story_name: str, cluster_id: str):
     """
     Save a single cluster's partitions to CSV file.
     
     Args:
         partitions: List of partitions for a single cluster
-        output_dir: Directory to save output file
+        output_dir: Directory to save output file (must already exist)
         story_name: Name of the story
         cluster_id: ID of the cluster
     """
-    os.makedirs(output_dir, exist_ok=True)
-    
     # Save partition file
     output_file = os.path.join(output_dir, f"{story_name}_cluster_{cluster_id}_partitions.csv")
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
         writer = csv.writer(f)
         writer.writerow(['Partition', 'ID', 'Text', 'V_pred', 'A_pred', 'Word_Count'])
-        
-        for part_idx, partition in enumerate(partitions):
-            for sent in partition:
-                writer.writerow([
-                    part_idx + 1,
-                    sent['ID'],
-                    sent['text'],
-                    sent.get('V_pred', ''),
-                    sent.get('A_pred', ''),
-                    count_words(sent['text'])
-                ])
+        writer.writerows([
+            (part_idx + 1, sent.id, sent.text, sent.v_pred, sent.a_pred, sent.wc)
+            for part_idx, partition in enumerate(partitions)
+            for sent in partition
+        ])
     
     print(f"Saved cluster {cluster_id} partitions to: {output_file}")
 
@@ -223,16 +372,17 @@ def save_partitioned_results(results: Dict, output_dir: str, story_name: str):
     
     # Save summary file
     summary_path = os.path.join(output_dir, f"{story_name}_partitions_summary.csv")
-    with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+    with open(summary_path, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
         writer = csv.writer(f)
         writer.writerow(['Cluster', 'Partition', 'Num_Sentences', 'Word_Count', 'Sentence_IDs'])
         
         for cluster_id, partitions in sorted(results.items()):
-            for part_idx, partition in enumerate(partitions):
-                num_sentences = len(partition)
-                word_count = sum(count_words(s['text']) for s in partition)
-                sentence_ids = ','.join(s['ID'] for s in partition)
-                writer.writerow([cluster_id, part_idx + 1, num_sentences, word_count, sentence_ids])
+            word_counts = partition_word_counts(partitions).tolist()
+            writer.writerows([
+                (cluster_id, part_idx + 1, len(partition), word_count,
+                 ','.join([s.id for s in partition]))
+                for part_idx, (partition, word_count) in enumerate(zip(partitions, word_counts))
+            ])
     
     print(f"\nSaved summary to: {summary_path}")
     
@@ -255,10 +405,7 @@ def main():
             continue
         
         # Read cluster statistics to get cluster IDs
-        cluster_stats = []
-        with open(stats_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            cluster_stats = list(reader)
+        cluster_stats = read_cluster_stats(stats_csv)
         
         # Determine number of partitions for each cluster transition
         # Based on the number of interpolation files
@@ -269,7 +416,8 @@ def main():
             interp_dir = f"outputs/piano_melodies/{story_name}/2bar/interpolations/{transition}"
             if os.path.exists(interp_dir):
                 # Count MIDI files and divide by 2 (assuming input/output pairs)
-                num_partitions[transition] = len(os.listdir(interp_dir)) // 2
+                with os.scandir(interp_dir) as entries:
+                    num_partitions[transition] = sum(1 for _ in entries) // 2
             else:
                 print(f"Warning: Directory not found: {interp_dir}")
                 raise ValueError(f"Directory not found: {interp_dir}") # Default fallback
@@ -282,6 +430,9 @@ def main():
         print(f"Number of partitions per transition: {num_partitions}")
         print("="*60)
         
+        # Read the sentences once for all of this story's clusters
+        all_sentences, ids = load_clustered_sentences(clustered_csv)
+        
         # Track summary data for this story
         summary_data = []
         
@@ -290,10 +441,7 @@ def main():
             if transition_idx >= len(cluster_stats):
                 break
             
-            cluster_info = cluster_stats[transition_idx]
-            cluster_id = cluster_info['Cluster']
-            start_id = int(cluster_info['Start_ID'])
-            end_id = int(cluster_info['End_ID'])
+            cluster_id, start_id, end_id = cluster_stats[transition_idx]
             n_partitions = num_partitions[transition]
             
             # Skip if no partitions (directory was empty or didn't exist)
@@ -302,20 +450,21 @@ def main():
                 continue
             
             # Segment this cluster
-            partitions = segment_single_cluster(
-                clustered_csv, cluster_id, start_id, end_id, n_partitions
+            partitions = segment_single_cluster_from_list(
+                sentences_in_range(all_sentences, ids, start_id, end_id), cluster_id, n_partitions
             )
             
             if partitions:
                 # Save to sentence_to_midi directory structure
                 output_dir = f"sentence_to_midi/{story_name}/cluster_{transition}"
+                os.makedirs(output_dir, exist_ok=True)
                 save_cluster_partitions(partitions, output_dir, story_name, cluster_id)
                 
                 # Add to summary
-                for part_idx, partition in enumerate(partitions):
-                    word_count = sum(count_words(s['text']) for s in partition)
+                word_counts = partition_word_counts(partitions).tolist()
+                for part_idx, (partition, word_count) in enumerate(zip(partitions, word_counts)):
                     num_sentences = len(partition)
-                    sentence_ids = ','.join(s['ID'] for s in partition)
+                    sentence_ids = ','.join([s.id for s in partition])
                     summary_data.append({
                         'Cluster': cluster_id,
                         'Transition': transition,
@@ -331,7 +480,7 @@ def main():
             os.makedirs(summary_dir, exist_ok=True)
             summary_path = os.path.join(summary_dir, f"{story_name}_summary.csv")
             
-            with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+            with open(summary_path, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
                 writer = csv.DictWriter(f, fieldnames=['Cluster', 'Transition', 'Partition', 
                                                        'Num_Sentences', 'Word_Count', 'Sentence_IDs'])
                 writer.writeheader()
@@ -0,0 +1,109 @@
+"""Tests for segment_story_sentences."""
+
+import random
+
+from absl.testing import absltest
+import segment_story_sentences
+from segment_story_sentences import Sentence
+
+
+def _make_sentences(word_counts):
+    """Build sentences with the given word counts, IDs '0', '1', ..."""
+    return [
+        Sentence(str(i), ' '.join(['word'] * wc), '', '', wc)
+        for i, wc in enumerate(word_counts)
+    ]
+
+
+def _reference_min_max_sum(word_counts, k):
+    """
+    Smallest achievable maximum partition word count, by the quadratic DP.
+
+    This is the dynamic program partition_sentences used before it switched to
+    binary search, kept here as the reference for the optimal cost.
+    """
+    n = len(word_counts)
+    prefix_sums = [0]
+    for wc in word_counts:
+        prefix_sums.append(prefix_sums[-1] + wc)
+
+    dp = [[float('inf')] * (k + 1) for _ in range(n + 1)]
+    dp[0][0] = 0
+    for i in range(1, n + 1):
+        for j in range(1, min(i, k) + 1):
+            for p in range(j - 1, i):
+                dp[i][j] = min(dp[i][j], max(dp[p][j - 1], prefix_sums[i] - prefix_sums[p]))
+    return dp[n][k]
+
+
+class PartitionSentencesTest(absltest.TestCase):
+
+    def assertValidPartition(self, sentences, partitions, num_partitions):
+        """Check partitions are non-empty, in order, cover every sentence and number min(k, n)."""
+        self.assertLen(partitions, min(num_partitions, len(sentences)))
+        for partition in partitions:
+            self.assertNotEmpty(partition)
+        self.assertEqual(
+            [s.id for partition in partitions for s in partition],
+            [s.id for s in sentences]
+        )
+
+    def testEmpty(self):
+        self.assertEqual(segment_story_sentences.partition_sentences([], 3), [])
+
+    def testNonPositivePartitions(self):
+        sentences = _make_sentences([1, 2, 3])
+        with self.assertRaises(ValueError):
+            segment_story_sentences.partition_sentences(sentences, 0)
+        with self.assertRaises(ValueError):
+            segment_story_sentences.partition_sentences(sentences, -1)
+
+    def testSinglePartition(self):
+        sentences = _make_sentences([4, 1, 3])
+        partitions = segment_story_sentences.partition_sentences(sentences, 1)
+        self.assertEqual(partitions, [sentences])
+
+    def testOnePartitionPerSentence(self):
+        sentences = _make_sentences([4, 1, 3])
+        partitions = segment_story_sentences.partition_sentences(sentences, 3)
+        self.assertEqual(partitions, [[s] for s in sentences])
+
+    def testMorePartitionsThanSentences(self):
+        sentences = _make_sentences([4, 1, 3])
+        partitions = segment_story_sentences.partition_sentences(sentences, 10)
+        self.assertEqual(partitions, [[s] for s in sentences])
+
+    def testZeroWordSentences(self):
+        sentences = _make_sentences([0, 0, 5, 0, 0, 0, 5, 0])
+        partitions = segment_story_sentences.partition_sentences(sentences, 4)
+        self.assertValidPartition(sentences, partitions, 4)
+        self.assertEqual(max(sum(s.wc for s in p) for p in partitions), 5)
+
+    def testAllZeroWordSentences(self):
+        sentences = _make_sentences([0] * 6)
+        partitions = segment_story_sentences.partition_sentences(sentences, 4)
+        self.assertValidPartition(sentences, partitions, 4)
+
+    def testMatchesReferenceDP(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            word_counts = [
+                rng.choice([0, 1, 2, 3, 5, 8, 20, 50])
+                for _ in range(rng.randint(1, 20))
+            ]
+            num_partitions = rng.randint(1, 25)
+            sentences = _make_sentences(word_counts)
+
+            partitions = segment_story_sentences.partition_sentences(sentences, num_partitions)
+
+            self.assertValidPartition(sentences, partitions, num_partitions)
+            k = min(num_partitions, len(sentences))
+            self.assertEqual(
+                max(sum(s.wc for s in p) for p in partitions),
+                _reference_min_max_sum(word_counts, k),
+                msg=f'word_counts={word_counts}, num_partitions={num_partitions}'
+            )
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -9,9 +9,29 @@ to each partition, creating a JSON mapping file.
 import csv
 import json
 import os
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from collections import defaultdict
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+
+# Buffer size for CSV/JSON reads and writes (larger than the 8 KiB default so
+# big files take far fewer read/write calls)
+IO_BUFFER_SIZE = 1 << 20
+
+# Sorted MIDI filenames per (story_name, transition), so each directory is listed once
+_MIDI_CACHE: Dict[Tuple[str, str], List[str]] = {}
+
 
 def read_summary_csv(summary_path: str) -> Dict[str, List[Dict]]:
     """
@@ -23,18 +43,48 @@ def read_summary_csv(summary_path: str) -> Dict[str, List[Dict]]:
     Returns:
         Dictionary mapping transition to list of partition info
     """
+    if PANDAS_AVAILABLE:
+        # Vectorized C parser; IDs stay strings and empty fields stay ''
+        df = pd.read_csv(
+            summary_path,
+            encoding='utf-8',
+            keep_default_na=False,
+            dtype={'Transition': str, 'Cluster': str, 'Partition': 'int64',
+                   'Num_Sentences': 'int64', 'Word_Count': 'int64', 'Sentence_IDs': str}
+        )
+        df = df.rename(columns={
+            'Cluster': 'cluster',
+            'Partition': 'partition',
+            'Num_Sentences': 'num_sentences',
+            'Word_Count': 'word_count',
+            'Sentence_IDs': 'sentence_ids'
+        })
+        fields = ['cluster', 'partition', 'num_sentences', 'word_count', 'sentence_ids']
+        return {
+            transition: group[fields].to_dict('records')
+            for transition, group in df.groupby('Transition', sort=False)
+        }
+    
     partitions_by_transition = defaultdict(list)
     
-    with open(summary_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with open(summary_path, 'r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = {name: i for i, name in enumerate(header)}
+        transition_col = idx['Transition']
+        cluster_col = idx['Cluster']
+        partition_col = idx['Partition']
+        num_sentences_col = idx['Num_Sentences']
+        word_count_col = idx['Word_Count']
+        sentence_ids_col = idx['Sentence_IDs']
+        
         for row in reader:
-            transition = row['Transition']
-            partitions_by_transition[transition].append({
-                'cluster': row['Cluster'],
-                'partition': int(row['Partition']),
-                'num_sentences': int(row['Num_Sentences']),
-                'word_count': int(row['Word_Count']),
-                'sentence_ids': row['Sentence_IDs']
+            partitions_by_transition[row[transition_col]].append({
+                'cluster': row[cluster_col],
+                'partition': int(row[partition_col]),
+                'num_sentences': int(row[num_sentences_col]),
+                'word_count': int(row[word_count_col]),
+                'sentence_ids': row[sentence_ids_col]
             })
     
     return dict(partitions_by_transition)
@@ -51,15 +101,20 @@ def get_midi_files(story_name: str, transition: str) -> List[str]:
     Returns:
         Sorted list of MIDI filenames
     """
-    midi_dir = f"outputs/piano_melodies/{story_name}/2bar/interpolations/{transition}"
+    key = (story_name, transition)
+    if key in _MIDI_CACHE:
+        return _MIDI_CACHE[key]
     
-    if not os.path.exists(midi_dir):
-        return []
+    midi_dir = f"outputs/piano_melodies/{story_name}/2bar/interpolations/{transition}"
     
     # Get all .mid files and sort them
-    midi_files = [f for f in os.listdir(midi_dir) if f.endswith('.mid')]
-    midi_files.sort()
+    try:
+        with os.scandir(midi_dir) as entries:
+            midi_files = sorted(entry.name for entry in entries if entry.name.endswith('.mid'))
+    except FileNotFoundError:
+        return []
     
+    _MIDI_CACHE[key] = midi_files
     return midi_files
 
 
@@ -93,8 +148,11 @@ def map_midis_to_partitions(partitions: List[Dict], midi_files: List[str]) -> Li
     # Find partition with highest word count for extra MIDI
     largest_partition_idx = 0
     if has_extra:
-        largest_partition_idx = max(range(len(partitions)), 
-                                   key=lambda i: partitions[i]['word_count'])
+        best_word_count = -1
+        for i, partition in enumerate(partitions):
+            if partition['word_count'] > best_word_count:
+                best_word_count = partition['word_count']
+                largest_partition_idx = i
     
     # Assign MIDIs to partitions
     midi_idx = 0
@@ -104,12 +162,9 @@ def map_midis_to_partitions(partitions: List[Dict], midi_files: List[str]) -> Li
         # Determine how many MIDIs this partition gets
         num_files = 3 if (has_extra and i == largest_partition_idx) else 2
         
-        # Assign MIDI files
-        assigned_midis = []
-        for _ in range(num_files):
-            if midi_idx < len(midi_files):
-                assigned_midis.append(midi_files[midi_idx])
-                midi_idx += 1
+        # Assign the next MIDI files (the slice stops early if files run out)
+        assigned_midis = midi_files[midi_idx:midi_idx + num_files]
+        midi_idx += num_files
         
         # Create result entry
         result.append({
@@ -173,8 +228,13 @@ def create_midi_mapping(story_name: str):
     output_path = f"sentence_to_midi/{story_name}/{story_name}_midi_mapping.json"
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(mapping, f, indent=2)
+    if ORJSON_AVAILABLE:
+        # orjson does the indentation in native code and returns bytes
+        with open(output_path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+            f.write(orjson.dumps(mapping, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+            json.dump(mapping, f, indent=2)
     
     print(f"\n{'='*60}")
     print(f"Saved mapping to: {output_path}")